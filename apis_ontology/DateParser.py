@@ -1,186 +1,199 @@
+import functools
+import logging
 import math
 import re
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
 
-def parse_date(date_string: str) -> (datetime, datetime, datetime):
-    """
-    function to parse a string date field of an entity
-
-    :param date_string : str :
-        the field value passed by a user
-    :return date_single : datetime :
-        single date which represents either the precise date given by user or median in between a range.
-    :return date_ab : datetime :
-        starting date of a range if user passed a range value either implicit or explicit.
-    :return date_bis : datetime :
-        ending date of a range if user passed a range value either implicit or explicit.
-    """
+# the Y-M-D combinations a single date can be written in
+YEAR = re.compile(r"\d{3,4}$")
+MONTH_YEAR = re.compile(r"\d{1,2}\.\d{3,4}$")
+DAY_MONTH_YEAR = re.compile(r"\d{1,2}\.\d{1,2}\.\d{3,4}$")
+YEAR_MONTH = re.compile(r"\d{3,4}\.\d{1,2}\.?$")
+YEAR_MONTH_DAY = re.compile(r"\d{3,4}\.\d{1,2}\.\d{1,2}\.?$")
+DOT = re.compile(r"\.")
+ANGLE_BRACKETS = re.compile(r"(<.*?>)")
+AB_BIS = re.compile(r"(ab|bis)")
 
-    def parse_date_range_individual(date, ab=False, bis=False):
-        """
-        As a sub function to parse_date, this function parse_date_individual handles a very single date since
-        in a text field a user can pass multiple dates.
+# the number of distinct date strings whose parse results are kept
+PARSE_CACHE_SIZE = 4096
 
-        :param date : str :
-            recognized sub string which potentially is a date (in julian calendar format)
-        :param ab : boolean : optional
-            indicates if a single date shall be intepreted as a starting date of a range
-        :param bis : boolean : optional
-            indicates if a single date shall be intepreted as an ending date of a range
-        :return tuple (datetime, datetime) :
-            two datetime objects representing the dates.
-            Two indicate that an implicit single date range was given (e.g. a year without months or days).
-            Has to be further processed then since it can be either a starting or ending date range.
-        or
-        :return datetime :
-            One datetime object representing the date.
-            if a single date was given.
-        """
 
-        def get_last_day_of_month(month, year):
-            """
-            Helper function to return the last day of a given month and year (respecting leap years)
+def get_last_day_of_month(month, year):
+    """
+    Helper function to return the last day of a given month and year (respecting leap years)
 
-            :param month : int
-            :param year : int
-            :return day : int
-            """
+    :param month : int
+    :param year : int
+    :return day : int
+    """
 
-            if month in [1, 3, 5, 7, 8, 10, 12]:
-                # 31 day months
-                return 31
-            elif month in [4, 6, 9, 11]:
-                # 30 day months
-                return 30
-            elif month == 2:
-                # special case february, differentiate leap years with respect to gregorian leap rules
-                if year % 4 == 0:
-                    if year % 100 == 0:
-                        if year % 400 == 0:
-                            # divisible by 4, by 100, by 400
-                            # thus is leap year
-                            return 29
-                        else:
-                            # divisible by 4, by 100, not by 400
-                            # thus is not leap yar
-                            return 28
-                    else:
-                        # divisible by 4, not by 100, if by 400 doesn't matter
-                        # thus is leap year
-                        return 29
+    if month in [1, 3, 5, 7, 8, 10, 12]:
+        # 31 day months
+        return 31
+    elif month in [4, 6, 9, 11]:
+        # 30 day months
+        return 30
+    elif month == 2:
+        # special case february, differentiate leap years with respect to gregorian leap rules
+        if year % 4 == 0:
+            if year % 100 == 0:
+                if year % 400 == 0:
+                    # divisible by 4, by 100, by 400
+                    # thus is leap year
+                    return 29
                 else:
-                    # not divisible by 4, if by 100 or by 400 doesn't matter
+                    # divisible by 4, by 100, not by 400
+                    # thus is not leap yar
                     return 28
             else:
-                # no valid month
-                raise ValueError("Month " + str(month) + " does not exist.")
-
-        # replace all kinds of delimiters
-        date = (
-            date.replace(" ", "").replace("-", ".").replace("/", ".").replace("\\", ".")
-        )
-        # parse into variables for use later
-        year = None
-        month = None
-        day = None
-        # check for all kind of Y-M-D combinations
-        if re.match(r"\d{3,4}$", date):
-            # year
-            year = int(date)
-        elif re.match(r"\d{1,2}\.\d{3,4}$", date):
-            # month - year
-            tmp = re.split(r"\.", date)
-            month = int(tmp[0])
-            year = int(tmp[1])
-        elif re.match(r"\d{1,2}\.\d{1,2}\.\d{3,4}$", date):
-            # day - month - year
-            tmp = re.split(r"\.", date)
-            day = int(tmp[0])
-            month = int(tmp[1])
-            year = int(tmp[2])
-        elif re.match(r"\d{3,4}\.\d{1,2}\.?$", date):
-            # year - month
-            tmp = re.split(r"\.", date)
-            year = int(tmp[0])
-            month = int(tmp[1])
-        elif re.match(r"\d{3,4}\.\d{1,2}\.\d{1,2}\.?$", date):
-            # year - month - day
-            tmp = re.split(r"\.", date)
-            year = int(tmp[0])
-            month = int(tmp[1])
-            day = int(tmp[2])
+                # divisible by 4, not by 100, if by 400 doesn't matter
+                # thus is leap year
+                return 29
         else:
-            # No sensical interpretation found
-            raise ValueError("Could not interpret date.")
-        if (ab and bis) or year is None:
-            # both ab and bis in one single date are not valid, neither is the absence of a year.
-            raise ValueError("Could not interpret date.")
-        elif not ab and not bis and (month is None or day is None):
-            # if both ab and bis are False and either month or day is empty, then it was given
-            # an implicit date range (range of all months if given a year or all days if given a month)
-            # construct implicit month range
-            if month is None:
-                month_ab = 1
-                month_bis = 12
-            else:
-                month_ab = month
-                month_bis = month
-            # construct implicit day range
-            if day is None:
-                day_ab = 1
-                day_bis = get_last_day_of_month(month_bis, year)
-            else:
-                day_ab = day
-                day_bis = day
+            # not divisible by 4, if by 100 or by 400 doesn't matter
+            return 28
+    else:
+        # no valid month
+        raise ValueError("Month " + str(month) + " does not exist.")
+
+
+def parse_date_range_individual(date, ab=False, bis=False):
+    """
+    As a sub function to parse_date, this function parse_date_individual handles a very single date since
+    in a text field a user can pass multiple dates.
+
+    :param date : str :
+        recognized sub string which potentially is a date (in julian calendar format)
+    :param ab : boolean : optional
+        indicates if a single date shall be intepreted as a starting date of a range
+    :param bis : boolean : optional
+        indicates if a single date shall be intepreted as an ending date of a range
+    :return tuple (datetime, datetime) :
+        two datetime objects representing the dates.
+        Two indicate that an implicit single date range was given (e.g. a year without months or days).
+        Has to be further processed then since it can be either a starting or ending date range.
+    or
+    :return datetime :
+        One datetime object representing the date.
+        if a single date was given.
+    """
 
-            # return a tuple from a single date (which the calling function has to further process)
-            return (
-                datetime(year=year, month=month_ab, day=day_ab),
-                datetime(year=year, month=month_bis, day=day_bis),
-            )
+    # replace all kinds of delimiters
+    date = (
+        date.replace(" ", "").replace("-", ".").replace("/", ".").replace("\\", ".")
+    )
+    # parse into variables for use later
+    year = None
+    month = None
+    day = None
+    # check for all kind of Y-M-D combinations
+    if YEAR.match(date):
+        # year
+        year = int(date)
+    elif MONTH_YEAR.match(date):
+        # month - year
+        tmp = DOT.split(date)
+        month = int(tmp[0])
+        year = int(tmp[1])
+    elif DAY_MONTH_YEAR.match(date):
+        # day - month - year
+        tmp = DOT.split(date)
+        day = int(tmp[0])
+        month = int(tmp[1])
+        year = int(tmp[2])
+    elif YEAR_MONTH.match(date):
+        # year - month
+        tmp = DOT.split(date)
+        year = int(tmp[0])
+        month = int(tmp[1])
+    elif YEAR_MONTH_DAY.match(date):
+        # year - month - day
+        tmp = DOT.split(date)
+        year = int(tmp[0])
+        month = int(tmp[1])
+        day = int(tmp[2])
+    else:
+        # No sensical interpretation found
+        raise ValueError("Could not interpret date.")
+    if (ab and bis) or year is None:
+        # both ab and bis in one single date are not valid, neither is the absence of a year.
+        raise ValueError("Could not interpret date.")
+    elif not ab and not bis and (month is None or day is None):
+        # if both ab and bis are False and either month or day is empty, then it was given
+        # an implicit date range (range of all months if given a year or all days if given a month)
+        # construct implicit month range
+        if month is None:
+            month_ab = 1
+            month_bis = 12
+        else:
+            month_ab = month
+            month_bis = month
+        # construct implicit day range
+        if day is None:
+            day_ab = 1
+            day_bis = get_last_day_of_month(month_bis, year)
         else:
-            # Either ab or bis is True. Then use the respective beginning or end of range and construct a precise date
-            # Or both ab and bis are False. Then construct a precise date from parsed values
-            # construct implicit month range if month is None
-            if month is None:
-                if ab and not bis:
-                    # is a starting date, thus take first month of year
-                    month = 1
-                elif not ab and bis:
-                    # is an ending date, thus take last month of year
-                    month = 12
-            # construct implicit day range if day is None
-            if day is None:
-                if ab and not bis:
-                    # is a starting date, thus take first day of month
-                    day = 1
-                elif not ab and bis:
-                    # is an ending date, thus take last month of year
-                    day = get_last_day_of_month(month=month, year=year)
+            day_ab = day
+            day_bis = day
+
+        # return a tuple from a single date (which the calling function has to further process)
+        return (
+            datetime(year=year, month=month_ab, day=day_ab),
+            datetime(year=year, month=month_bis, day=day_bis),
+        )
+    else:
+        # Either ab or bis is True. Then use the respective beginning or end of range and construct a precise date
+        # Or both ab and bis are False. Then construct a precise date from parsed values
+        # construct implicit month range if month is None
+        if month is None:
+            if ab and not bis:
+                # is a starting date, thus take first month of year
+                month = 1
+            elif not ab and bis:
+                # is an ending date, thus take last month of year
+                month = 12
+        # construct implicit day range if day is None
+        if day is None:
+            if ab and not bis:
+                # is a starting date, thus take first day of month
+                day = 1
+            elif not ab and bis:
+                # is an ending date, thus take last month of year
+                day = get_last_day_of_month(month=month, year=year)
+
+        return datetime(year=year, month=month, day=day)
 
-            return datetime(year=year, month=month, day=day)
 
+def parse_iso_date(date_string):
+    date_string_split = date_string.split("-")
+    try:
+        return datetime(
+            year=int(date_string_split[0]),
+            month=int(date_string_split[1]),
+            day=int(date_string_split[2]),
+        )
+    except Exception:
+        raise ValueError("Invalid iso date: ", date_string)
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_normalized_date(date_string: str) -> tuple:
+    """
+    Parse a date string that was normalized by `normalize_date_string`.
+    Returns the `(single, ab, bis)` dates and the parse error, if any. The
+    dates that were parsed before an error occured are returned as well.
+    """
+    # return variables
+    date_single = None
+    date_ab = None
+    date_bis = None
     try:
-        # return variables
-        date_single = None
-        date_ab = None
-        date_bis = None
         # split for angle brackets, check if explicit iso date is contained within them
-        date_split_angle = re.split(r"(<.*?>)", date_string)
+        date_split_angle = ANGLE_BRACKETS.split(date_string)
         if len(date_split_angle) > 1:
             # date string contains angle brackets. Parse them, ignore the rest
-            def parse_iso_date(date_string):
-                date_string_split = date_string.split("-")
-                try:
-                    return datetime(
-                        year=int(date_string_split[0]),
-                        month=int(date_string_split[1]),
-                        day=int(date_string_split[2]),
-                    )
-                except Exception:
-                    raise ValueError("Invalid iso date: ", date_string)
-
             if len(date_split_angle) > 3:
                 # invalid case
                 raise ValueError("Too many angle brackets.")
@@ -212,14 +225,12 @@ def parse_date(date_string: str) -> (datetime, datetime, datetime):
                     date_single = parse_iso_date(date_single_string)
         else:
             # date string contains no angle brackets. Interpret the possible date formats
-            date_string = date_string.lower()
-            date_string = date_string.replace(" ", "")
             # helper variables for the following loop
             found_ab = False
             found_bis = False
             found_single = False
             # split by allowed keywords 'ab' and 'bis' and iterate over them
-            date_split_ab_bis = re.split(r"(ab|bis)", date_string)
+            date_split_ab_bis = AB_BIS.split(date_string)
             for i, v in enumerate(date_split_ab_bis):
                 if v == "ab":
                     # indicates that the next value must be a start date
@@ -268,8 +279,37 @@ def parse_date(date_string: str) -> (datetime, datetime, datetime):
             elif date_ab is None and date_bis is not None:
                 # date is only the end of a range, save it also as the single date
                 date_single = date_bis
-
     except Exception as e:
-        print("Could not parse date: '", date_string, "' due to error: ", e)
+        return (date_single, date_ab, date_bis), e
+
+    return (date_single, date_ab, date_bis), None
+
+
+def normalize_date_string(date_string: str) -> str:
+    """
+    Dates without angle brackets are case and whitespace insensitive,
+    so they are lowercased and stripped of spaces before parsing. That
+    also lets different spellings of a date share a cache entry.
+    """
+    if isinstance(date_string, str) and not ANGLE_BRACKETS.search(date_string):
+        return date_string.lower().replace(" ", "")
+    return date_string
 
-    return date_single, date_ab, date_bis
+
+def parse_date(date_string: str) -> (datetime, datetime, datetime):
+    """
+    function to parse a string date field of an entity
+
+    :param date_string : str :
+        the field value passed by a user
+    :return date_single : datetime :
+        single date which represents either the precise date given by user or median in between a range.
+    :return date_ab : datetime :
+        starting date of a range if user passed a range value either implicit or explicit.
+    :return date_bis : datetime :
+        ending date of a range if user passed a range value either implicit or explicit.
+    """
+    dates, error = parse_normalized_date(normalize_date_string(date_string))
+    if error is not None:
+        logger.warning("Could not parse date: '%s' due to error: %s", date_string, error)
+    return dates
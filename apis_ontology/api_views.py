@@ -1,24 +1,38 @@
+import itertools
+import json
+import tempfile
 import django_filters
-from django.db.models import Q, F
+from django.db.models import Q
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from rest_framework.generics import ListAPIView
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
 from rest_framework import pagination
-from apis_ontology.serializers import RelationSerializer, NetworkSerializer
+from apis_ontology.serializers import RelationSerializer, NetworkSerializer, NETWORK_EDGE_FILTER_LIMIT
 from apis_core.generic.api_views import ModelViewSet
 from apis_core.apis_metainfo.models import RootObject
 from apis_ontology.filtersets import NetworkFilterSet
-from apis_ontology.models import Salary
 from apis_core.relations.models import Relation
-from apis_core.relations.templatetags.relations import get_relation_targets_from
+from apis_ontology.facets import calculate_facets, get_facet_summary
+from apis_ontology.caching import get_generation
+from apis_ontology.graphexport import write_graph
 import time
 
+LIST_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
 
 class InjectFacetPagination(pagination.LimitOffsetPagination):
+    # query parameters that do not narrow down the list
+    unfiltered_params = ["limit", "offset", "format"]
+
     def paginate_queryset(self, queryset, request, view=None):
         start = time.time()
-        self.facets = self.calculate_facets(queryset)
+        if set(request.query_params) - set(self.unfiltered_params):
+            self.facets = self.calculate_facets(queryset)
+        else:
+            self.facets = {"facets": get_facet_summary(queryset, public=not request.user.is_authenticated)}
         print("Used " + str(time.time() - start) + "ms for calculating the facets")
         return super().paginate_queryset(queryset, request, view)
 
@@ -28,60 +42,8 @@ class InjectFacetPagination(pagination.LimitOffsetPagination):
         response.data = dict(sorted(response.data.items()))
         return response
 
-    def get_pretty_object_name(self, obj: object) -> str:
-        match type(obj).__name__:
-            case "Person":
-                if obj.first_name:
-                    return f"{obj.first_name} {obj.name}"
-                return f"{obj.name}"
-            case "Place":
-                return obj.label
-            case _:
-                return getattr(obj, "name", None)
-
     def calculate_facets(self, queryset):
-        facets = {"start": None,
-                  "end": None,
-                  "gender": {},
-                  "type": {}}
-        print("calculate_facets")
-        for obj in queryset:
-            for attribute in ["gender", "type"]:
-                if hasattr(obj, attribute):
-                    value = getattr(obj, attribute)
-                    id = value or "emtpy"
-                    facetdict = facets[attribute].get(id, {"name": value, "count": 0})
-                    facetdict["count"] += 1
-                    facets[attribute][id] = facetdict
-                else:
-                    facets.pop(attribute, None)
-            if start_date := getattr(obj, "start_date", None):
-                facets["start"] = min(start_date.year, facets["start"], key=lambda x: x or 1600)
-            if end_date := getattr(obj, "end_date", None):
-                facets["end"] = max(end_date.year, facets["end"], key=lambda x: x or 1300)
-
-        targets = get_relation_targets_from(queryset.first())
-
-        for ct in targets:
-            facetname = "relation_" + ct.name
-            facets[facetname] = {}
-            rels_fwd = Relation.objects.filter(obj_content_type=ct.id, subj_object_id__in=queryset).annotate(f=F("subj_object_id"), t=F("obj_object_id")).values("t", "f")
-            rels_bkw = Relation.objects.filter(subj_content_type=ct.id, obj_object_id__in=queryset).annotate(f=F("obj_object_id"), t=F("subj_object_id")).values("t", "f")
-            rels = rels_fwd | rels_bkw
-            related_ids = [x["t"] for x in rels]
-            instances = ct.model_class().objects.filter(pk__in=related_ids)
-
-            for obj in instances:
-                related_ids = [x["f"] for x in rels if x["t"] == obj.id]
-                name = self.get_pretty_object_name(obj)
-                facets[facetname][obj.id] = {"name": name, "count": len(set(related_ids))}
-
-        for facet in facets.keys():
-            if facet.startswith("relation_"):
-                facets[facet] = dict(sorted(facets[facet].items()))
-
-        print("end calculate facets")
-        return {"facets": facets}
+        return calculate_facets(queryset)
 
 
 class ListEntityRelations(ListAPIView):
@@ -90,8 +52,8 @@ class ListEntityRelations(ListAPIView):
     def get_queryset(self):
         contenttype = self.kwargs["contenttype"]
         pk = self.kwargs["pk"]
-        exclude_salaries = Salary.objects.exclude(typ__in=["Sold", "Provision", "Sonstiges"])
-        return Relation.objects.filter(Q(subj_content_type=contenttype, subj_object_id=pk)|Q(obj_content_type=contenttype, obj_object_id=pk)).exclude(Q(subj_object_id__in=exclude_salaries)|Q(obj_object_id__in=exclude_salaries)).select_subclasses()
+        # relations to salaries that are not public are marked, see `HiddenSalaryRelation`
+        return Relation.objects.filter(Q(subj_content_type=contenttype, subj_object_id=pk)|Q(obj_content_type=contenttype, obj_object_id=pk)).filter(hidden_salary__isnull=True).select_subclasses()
 
     def get_serializer_context(self):
         contenttype = self.kwargs["contenttype"]
@@ -109,15 +71,74 @@ class SicprodModelViewSet(ModelViewSet):
 
     pagination_class = InjectFacetPagination
 
-    @method_decorator(cache_page(60 * 60 * 2))
     def list(self, request, contenttype, format=None):
-        return super().list(request, contenttype, format)
+        # The cache generation of the content type is part of the
+        # cache key, so the signals can invalidate the cached lists
+        # of a content type as soon as something changes
+        key_prefix = f"sicprodlist-{contenttype.pk}-{get_generation(contenttype)}"
+        view = cache_page(LIST_CACHE_TIMEOUT, key_prefix=key_prefix)(super().list)
+        return view(request, contenttype, format)
 
 
 class Network(ListAPIView):
+    """
+    List all entities and the ids of the entities they are related to.
+    With `?stream=json` or `?stream=ndjson` the whole (filtered) graph
+    is streamed as a JSON array or as newline delimited JSON, chunk by
+    chunk from a server side cursor, instead of being serialized in
+    memory at once. Streamed responses are not paginated.
+    """
     serializer_class = NetworkSerializer
     filterset_class = NetworkFilterSet
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend]
+    stream_content_types = {
+        "json": "application/json",
+        "ndjson": "application/x-ndjson",
+    }
 
     def get_queryset(self):
         return RootObject.objects_inheritance.select_subclasses().distinct()
+
+    def list(self, request, *args, **kwargs):
+        stream = request.query_params.get("stream")
+        if stream not in self.stream_content_types:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset()).order_by("pk")
+        return StreamingHttpResponse(self.stream(queryset, stream), content_type=self.stream_content_types[stream])
+
+    def stream(self, queryset, stream):
+        # the chunks are small enough to let the serializer
+        # filter the relations of a chunk by the node ids
+        nodes = queryset.iterator(chunk_size=NETWORK_EDGE_FILTER_LIMIT)
+        separator = "\n" if stream == "ndjson" else ","
+        if stream == "json":
+            yield "["
+        first = True
+        for chunk in itertools.batched(nodes, NETWORK_EDGE_FILTER_LIMIT):
+            data = self.get_serializer(chunk, many=True).data
+            lines = separator.join(json.dumps(node) for node in data)
+            if stream == "ndjson":
+                yield lines + "\n"
+            else:
+                yield lines if first else separator + lines
+            first = False
+        if stream == "json":
+            yield "]"
+
+
+class NetworkExport(APIView):
+    """
+    Download all entities and relations as compressed numpy `.npz`
+    archive, see `apis_ontology.graphexport.export_graph`. Building the
+    archive reads the whole database, so it is limited to logged in
+    users; `manage.py exportnetwork` writes the same archive to a file.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, format=None):
+        # the archive is written to a temporary file and streamed from
+        # there, the file is closed and thus removed by the response
+        export = tempfile.TemporaryFile()
+        write_graph(export)
+        export.seek(0)
+        return FileResponse(export, as_attachment=True, filename="sicprod-network.npz")
@@ -0,0 +1,34 @@
+from typing import NamedTuple
+
+# the number of parsed bibtex entries kept per process
+BIBTEX_CACHE_SIZE = 4096
+
+_bibtex_cache = {}
+
+
+class ParsedBibtex(NamedTuple):
+    bibtex: dict
+    # the normalized title, or None if the entry has no title
+    title: str | None
+
+
+def normalize_title(title: str) -> str:
+    return title.replace(" ", "_").replace("(", "").replace(")", "")
+
+
+def get_parsed_bibtex(reference) -> ParsedBibtex:
+    """
+    The parsed bibtex of a reference and its normalized title. The
+    result is cached per process, keyed by the bibliographic item and
+    the last update of the reference, so a changed entry is parsed
+    again. The cached dict is shared, so it must not be modified.
+    """
+    key = (reference.bibs_url, getattr(reference, "last_update", None))
+    if (parsed := _bibtex_cache.get(key)) is None:
+        bibtex = reference.get_bibtex
+        title = normalize_title(bibtex["title"]) if bibtex and "title" in bibtex else None
+        parsed = ParsedBibtex(bibtex, title)
+        if len(_bibtex_cache) >= BIBTEX_CACHE_SIZE:
+            _bibtex_cache.clear()
+        _bibtex_cache[key] = parsed
+    return parsed
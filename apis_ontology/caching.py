@@ -0,0 +1,19 @@
+from django.db.models import F
+from apis_ontology.models import CacheGeneration
+
+
+def get_generation(content_type) -> int:
+    generation, _ = CacheGeneration.objects.get_or_create(content_type_id=getattr(content_type, "pk", content_type))
+    return generation.generation
+
+
+def bump_generation(content_types=None):
+    """
+    Increase the cache generation of the given content types or of
+    all content types. A content type without a generation row was
+    never read, so there are no cache entries to invalidate for it.
+    """
+    generations = CacheGeneration.objects.all()
+    if content_types is not None:
+        generations = generations.filter(content_type__in=content_types)
+    generations.update(generation=F("generation") + 1)
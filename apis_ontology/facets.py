@@ -0,0 +1,149 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError
+from django.db.models import Count, Max, Min
+from apis_core.relations.templatetags.relations import get_relation_targets_from
+from apis_ontology.caching import get_generation
+from apis_ontology.models import FacetSummary, RelationNeighbor
+
+FACET_ATTRIBUTES = ["gender", "type"]
+
+# The project covers the years 1300 to 1600 - a lower bound
+# after that period or an upper bound before it is not reported
+START_YEAR_LIMIT = 1600
+END_YEAR_LIMIT = 1300
+
+
+def has_field(model, name: str) -> bool:
+    try:
+        model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def get_pretty_object_name(obj: object) -> str:
+    match type(obj).__name__:
+        case "Person":
+            if obj.first_name:
+                return f"{obj.first_name} {obj.name}"
+            return f"{obj.name}"
+        case "Place":
+            return obj.label
+        case _:
+            return getattr(obj, "name", None)
+
+
+def calculate_attribute_facet(queryset, attribute) -> dict:
+    """
+    Count the values of `attribute` using one grouped query
+    """
+    facet = {}
+    counts = queryset.order_by().values(attribute).annotate(count=Count("pk", distinct=True)).order_by(attribute)
+    for row in counts:
+        value = row[attribute]
+        id = value or "emtpy"
+        facetdict = facet.get(id, {"name": value, "count": 0})
+        facetdict["count"] += row["count"]
+        facet[id] = facetdict
+    return facet
+
+
+def calculate_date_facets(queryset) -> dict:
+    """
+    Calculate the `start` and `end` years and the number of
+    objects in the queryset using one aggregate query
+    """
+    aggregates = {"total": Count("pk", distinct=True)}
+    if has_field(queryset.model, "start_date"):
+        aggregates["start"] = Min("start_date")
+    if has_field(queryset.model, "end_date"):
+        aggregates["end"] = Max("end_date")
+    result = queryset.order_by().aggregate(**aggregates)
+
+    facets = {"total": result["total"], "start": None, "end": None}
+    if (start_date := result.get("start")) and start_date.year <= START_YEAR_LIMIT:
+        facets["start"] = start_date.year
+    if (end_date := result.get("end")) and end_date.year >= END_YEAR_LIMIT:
+        facets["end"] = end_date.year
+    return facets
+
+
+def calculate_relation_facets(queryset) -> dict:
+    """
+    Count for every related object how many objects of the queryset
+    are connected to it, with one grouped `COUNT(DISTINCT)` query per
+    content type over the symmetric `RelationNeighbor` index, which
+    holds both directions of every relation, and fetch the names of
+    the targets with one additional query.
+    """
+    facets = {}
+    targets = get_relation_targets_from(queryset.first())
+    object_ids = queryset.order_by().values("pk")
+    content_type = ContentType.objects.get_for_model(queryset.model)
+
+    for ct in targets:
+        facetname = "relation_" + ct.name
+        neighbors = RelationNeighbor.objects.filter(neighbor_content_type=ct.id, entity_content_type=content_type, entity_id__in=object_ids).order_by()
+        counts = dict(neighbors.values("neighbor_id").annotate(count=Count("entity_id", distinct=True)).values_list("neighbor_id", "count"))
+
+        instances = ct.model_class().objects.filter(pk__in=neighbors.values("neighbor_id"))
+        facet = {}
+        for obj in instances:
+            facet[obj.id] = {"name": get_pretty_object_name(obj), "count": counts[obj.id]}
+        facets[facetname] = dict(sorted(facet.items()))
+    return facets
+
+
+def calculate_facets(queryset) -> dict:
+    """
+    Calculate the facets of a queryset. The value counts and the
+    date bounds are calculated in the database using grouped and
+    aggregate queries instead of iterating over the queryset.
+    """
+    dates = calculate_date_facets(queryset)
+    facets = {"start": dates["start"],
+              "end": dates["end"]}
+
+    for attribute in FACET_ATTRIBUTES:
+        if has_field(queryset.model, attribute):
+            facets[attribute] = calculate_attribute_facet(queryset, attribute)
+        elif not dates["total"]:
+            # an empty queryset still lists the facet
+            facets[attribute] = {}
+
+    facets.update(calculate_relation_facets(queryset))
+    return {"facets": facets}
+
+
+def get_facet_summary(queryset, public: bool) -> dict:
+    """
+    Return the stored facets of the unfiltered list of the querysets
+    model, calculate and store them if there is no summary of the
+    current cache generation yet
+    """
+    content_type = ContentType.objects.get_for_model(queryset.model)
+    # read before calculating, so facets calculated during a change
+    # are stored with the generation before the change
+    generation = get_generation(content_type)
+    summary = FacetSummary.objects.filter(content_type=content_type, public=public).first()
+    if summary is not None and summary.generation == generation:
+        return summary.facets
+    facets = calculate_facets(queryset)["facets"]
+    if summary is None:
+        try:
+            FacetSummary.objects.create(content_type=content_type, public=public, facets=facets, generation=generation)
+        except IntegrityError:
+            # a concurrent request already stored the summary
+            pass
+    else:
+        # a concurrent request may have stored a newer summary already
+        FacetSummary.objects.filter(pk=summary.pk, generation__lt=generation).update(facets=facets, generation=generation)
+    return facets
+
+
+def invalidate_facet_summaries(content_types=None):
+    summaries = FacetSummary.objects.all()
+    if content_types is not None:
+        summaries = summaries.filter(content_type__in=content_types)
+    summaries.delete()
@@ -1,5 +1,7 @@
 import django_filters
 from django.db.models import Q
+from django.db.models.functions import Greatest, Upper
+from django.contrib.postgres.search import TrigramWordSimilarity
 from django import forms
 from django.contrib.contenttypes.models import ContentType
 from apis_core.entities.filtersets import EntityFilterSet
@@ -8,24 +10,39 @@ from apis_core.collections.models import SkosCollection, SkosCollectionContentOb
 from collections import OrderedDict
 from apis_core.apis_entities.utils import get_entity_classes
 from functools import cache
-from apis_core.relations.models import Relation
+from apis_ontology.models import AlternativeLabel, RelationNeighbor
 
 
 ABSTRACT_ENTITY_FILTERS_EXCLUDE = ["review", "start_date", "start_start_date", "start_end_date", "end_date", "end_start_date", "end_end_date", "notes", "text", "published", "status", "references"]
 SICPROD_FILTERS_EXCLUDE = ABSTRACT_ENTITY_FILTERS_EXCLUDE + ["metadata", "deprecated_name"]
 
 
+def trigram_search(queryset, fields, value):
+    """
+    Search `fields` for `value` and order the results by similarity.
+    A field matches if it contains `value` or if one of its words is
+    similar to it, which also finds spelling variants. Both lookups
+    work on the uppercased fields, so they use the trigram indexes.
+    The lines of `alternative_label` are looked up in the indexed
+    AlternativeLabel table instead.
+    """
+    q = Q()
+    for field in fields:
+        if field == "alternative_label":
+            q |= Q(pk__in=AlternativeLabel.matching(queryset.model, value).values("object_id"))
+            continue
+        queryset = queryset.alias(**{f"{field}_upper": Upper(field)})
+        q |= Q(**{f"{field}__icontains": value}) | Q(**{f"{field}_upper__trigram_word_similar": value.upper()})
+    rank = Greatest(*[TrigramWordSimilarity(value, field) for field in fields])
+    return queryset.filter(q).annotate(search_rank=rank).order_by("-search_rank", *queryset.model._meta.ordering)
+
+
 def name_first_name_alternative_name_filter(queryset, name, value):
-    return queryset.filter(
-        Q(name__icontains=value) |
-        Q(first_name__icontains=value) |
-        Q(alternative_label__icontains=value))
+    return trigram_search(queryset, ["name", "first_name", "alternative_label"], value)
 
 
 def name_alternative_name_filter(queryset, name, value):
-    return queryset.filter(
-        Q(name__icontains=value) |
-        Q(alternative_label__icontains=value))
+    return trigram_search(queryset, ["name", "alternative_label"], value)
 
 
 def filter_empty_string(queryset, name, value):
@@ -171,9 +188,10 @@ class FacetFilter(django_filters.CharFilter):
         if not value:
             return qs
         if self.field_name.startswith("relation_"):
-            rels = list(Relation.objects.filter(subj_object_id__in=value).values_list("obj_object_id", flat=True))
-            rels += list(Relation.objects.filter(obj_object_id__in=value).values_list("subj_object_id", flat=True))
-            return qs.filter(pk__in=rels).distinct()
+            content_type = ContentType.objects.get_for_model(qs.model)
+            neighbor_content_type = ContentType.objects.get_by_natural_key("apis_ontology", self.field_name.removeprefix("relation_"))
+            neighbors = RelationNeighbor.objects.filter(entity_content_type=content_type, neighbor_content_type=neighbor_content_type, neighbor_id__in=value)
+            return qs.filter(pk__in=neighbors.values("entity_id"))
         else:
             return qs.filter(**{f"{self.field_name}__in": value})
 
@@ -0,0 +1,108 @@
+import itertools
+
+import numpy as np
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from apis_core.relations.models import Relation
+from apis_ontology.models import SicprodMixin
+
+EXPORT_CHUNK_SIZE = 5000
+
+
+def get_ontology_models(base) -> list:
+    return [model for model in apps.get_app_config("apis_ontology").get_models() if issubclass(model, base)]
+
+
+def export_nodes(chunk_size: int = EXPORT_CHUNK_SIZE) -> dict:
+    """
+    Collect the ids, the content types and the labels of all entities.
+    The labels are stored as one utf-8 encoded blob and the offsets of
+    the single labels in that blob.
+    """
+    content_types = []
+    ids = []
+    types = []
+    label_offsets = [0]
+    label_data = bytearray()
+    for index, model in enumerate(get_ontology_models(SicprodMixin)):
+        content_type = ContentType.objects.get_for_model(model)
+        content_types.append(f"{content_type.app_label}.{content_type.model}")
+        for chunk in itertools.batched(model.objects.order_by("pk").iterator(chunk_size=chunk_size), chunk_size):
+            ids.append(np.fromiter((obj.pk for obj in chunk), dtype=np.int64, count=len(chunk)))
+            types.append(np.full(len(chunk), index, dtype=np.int16))
+            for obj in chunk:
+                label_data.extend(str(obj).encode())
+                label_offsets.append(len(label_data))
+    return {
+        "content_types": np.array(content_types, dtype=str),
+        "node_id": np.concatenate(ids) if ids else np.empty(0, dtype=np.int64),
+        "node_type": np.concatenate(types) if types else np.empty(0, dtype=np.int16),
+        "label_offsets": np.array(label_offsets, dtype=np.int64),
+        "label_data": np.frombuffer(bytes(label_data), dtype=np.uint8),
+    }
+
+
+def export_edges(chunk_size: int = EXPORT_CHUNK_SIZE) -> dict:
+    """
+    Collect the subject and object ids, the relation type and the
+    start and end sort dates of all relations, one relation class
+    after the other
+    """
+    relation_types = []
+    columns = {"source": [], "target": [], "type": [], "start": [], "end": []}
+    for index, model in enumerate(get_ontology_models(Relation)):
+        relation_types.append(model.__name__)
+        rows = model.objects.filter(subj_object_id__isnull=False, obj_object_id__isnull=False).order_by().values_list("subj_object_id", "obj_object_id", "start_date_sort", "end_date_sort")
+        for chunk in itertools.batched(rows.iterator(chunk_size=chunk_size), chunk_size):
+            source, target, start, end = zip(*chunk)
+            columns["source"].append(np.array(source, dtype=np.int64))
+            columns["target"].append(np.array(target, dtype=np.int64))
+            columns["type"].append(np.full(len(chunk), index, dtype=np.int16))
+            # missing dates become NaT
+            columns["start"].append(np.array(start, dtype="datetime64[D]"))
+            columns["end"].append(np.array(end, dtype="datetime64[D]"))
+    dtypes = {"source": np.int64, "target": np.int64, "type": np.int16, "start": "datetime64[D]", "end": "datetime64[D]"}
+    edges = {f"edge_{name}": np.concatenate(chunks) if chunks else np.empty(0, dtype=dtypes[name]) for name, chunks in columns.items()}
+    edges["relation_types"] = np.array(relation_types, dtype=str)
+    return edges
+
+
+def export_graph(chunk_size: int = EXPORT_CHUNK_SIZE) -> dict:
+    """
+    Export the graph as numpy arrays. The edges are sorted by the
+    position of their source node, so `indptr` and `indices` form a
+    CSR adjacency matrix over the node positions whose entries line
+    up with the `edge_*` arrays: the edges of node `i` are the slice
+    `indptr[i]:indptr[i + 1]`. Edges between objects that are not
+    exported as nodes are dropped.
+    """
+    graph = export_nodes(chunk_size)
+    edges = export_edges(chunk_size)
+
+    order = np.argsort(graph["node_id"], kind="stable")
+    sorted_ids = graph["node_id"][order]
+
+    def positions(ids):
+        """the node positions of the ids and whether the ids are nodes at all"""
+        if not len(sorted_ids):
+            return np.zeros(len(ids), dtype=np.int64), np.zeros(len(ids), dtype=bool)
+        found = np.searchsorted(sorted_ids, ids).clip(max=len(sorted_ids) - 1)
+        return order[found], sorted_ids[found] == ids
+
+    source, source_valid = positions(edges["edge_source"])
+    target, target_valid = positions(edges["edge_target"])
+    valid = source_valid & target_valid
+    edge_order = np.argsort(source[valid], kind="stable")
+    for name in ["edge_source", "edge_target", "edge_type", "edge_start", "edge_end"]:
+        graph[name] = edges[name][valid][edge_order]
+    graph["relation_types"] = edges["relation_types"]
+    graph["indices"] = target[valid][edge_order]
+    graph["indptr"] = np.concatenate([[0], np.cumsum(np.bincount(source[valid], minlength=len(graph["node_id"])))]).astype(np.int64)
+    return graph
+
+
+def write_graph(file, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Write the graph export to `file` as compressed `.npz` archive
+    """
+    np.savez_compressed(file, **export_graph(chunk_size))
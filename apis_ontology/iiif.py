@@ -0,0 +1,99 @@
+import functools
+import hashlib
+import json
+import logging
+import pathlib
+import re
+
+from .bibtex import get_parsed_bibtex, normalize_title  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+IIIF_JSON = pathlib.Path("data/iiif.json")
+
+# The folio tokens `get_folio` looks for in the scan filenames (like
+# "012", "012r" or "12") are short, so the index maps every substring
+# of a scan filename up to this length to the first scan of the title
+# that contains it. That gives the same result as searching the list
+# of scans for the token, but with a dictionary lookup.
+MAX_TOKEN_LENGTH = 4
+
+NUMBER = re.compile(r"(?P<number>\d+)")
+
+
+class IIIFIndex:
+    def __init__(self, titles: dict, version: int = 0):
+        self.titles = titles
+        self.version = version
+        self.tokens = {}
+        for title, scanfiles in titles.items():
+            tokens = {}
+            for scanfile in scanfiles:
+                for length in range(1, MAX_TOKEN_LENGTH + 1):
+                    for start in range(len(scanfile) - length + 1):
+                        tokens.setdefault(scanfile[start:start + length], scanfile)
+            self.tokens[title] = tokens
+
+    def find_scan(self, title: str, token: str) -> str | None:
+        """
+        Return the first scan of `title` that contains `token`
+        """
+        if len(token) <= MAX_TOKEN_LENGTH:
+            return self.tokens[title].get(token)
+        return next((scanfile for scanfile in self.titles[title] if token in scanfile), None)
+
+
+def content_version(content: bytes) -> int:
+    """
+    A version derived from the content of the file, so all processes
+    that read the same file agree on it, whatever its mtime
+    """
+    return int.from_bytes(hashlib.blake2b(content, digest_size=8).digest(), "big", signed=True)
+
+
+@functools.lru_cache(maxsize=1)
+def load_iiif_index(mtime: int) -> IIIFIndex:
+    content = IIIF_JSON.read_bytes()
+    return IIIFIndex(json.loads(content), version=content_version(content))
+
+
+def get_iiif_index() -> IIIFIndex:
+    """
+    Return the index of the scans listed in `data/iiif.json`. The
+    index is only rebuilt if the file was modified since it was loaded.
+    Its version is a hash of the file content.
+    """
+    return load_iiif_index(IIIF_JSON.stat().st_mtime_ns)
+
+
+def iiif_titles():
+    return get_iiif_index().titles
+
+
+def get_folio(obj):
+    title = get_parsed_bibtex(obj).title
+    if page := obj.pages_start:
+        page = f"{page:03d}"
+    if obj.folio:
+        page = obj.folio
+        if "-" in obj.folio:
+            page = obj.folio.split("-")[0]
+        if "–" in obj.folio:
+            page = obj.folio.split("–")[0]
+        if page.endswith("v") or page.endswith("r"):
+            suffix = page[-1:]
+        if page:
+            if match := NUMBER.match(page):
+                page = match["number"]
+        if page.endswith("v") or page.endswith("r"):
+            page = page[:-1]
+        try:
+            page = int(page)
+            page = f"{page:03d}{suffix}"
+        except Exception:
+            pass
+    if page:
+        if scanfile := get_iiif_index().find_scan(title, str(page)):
+            return scanfile
+    logger.debug("No scan found for folio %s (page %s)", obj.folio, page)
+    return None
@@ -1,7 +1,43 @@
+import logging
+
 from django.db import models
 
 from . import DateParser
 
+logger = logging.getLogger(__name__)
+
+DATE_FIELDS = [
+    "start_date",
+    "start_start_date",
+    "start_end_date",
+    "end_date",
+    "end_start_date",
+    "end_end_date",
+]
+
+
+def derive_dates(start_date_written, end_date_written) -> tuple[dict, list[str]]:
+    """
+    Parse the written start and end dates and return the values of
+    the derived date fields and the parse errors. This does not touch
+    the database, so it can also run in worker processes.
+    """
+    dates = dict.fromkeys(DATE_FIELDS)
+    errors = []
+    for prefix, written in [("start", start_date_written), ("end", end_date_written)]:
+        if written:
+            parsed, error = DateParser.parse_normalized_date(
+                DateParser.normalize_date_string(written)
+            )
+            if error is not None:
+                errors.append(f"Could not parse date: '{written}' due to error: {error}")
+            # DateParser returns datetime, but we want dates without time
+            single, ab, bis = (date.date() if date else None for date in parsed)
+            dates[f"{prefix}_date"] = single
+            dates[f"{prefix}_start_date"] = ab
+            dates[f"{prefix}_end_date"] = bis
+    return dates, errors
+
 
 # This is abstract class provides a Mixin for APIS models that need
 # a temporal component. It provides commonly used felds for start
@@ -32,41 +68,11 @@ class LegacyDateMixin(models.Model):
     def save(self, *args, **kwargs):
         skip_date_parsing = getattr(self, "skip_date_parsing", False)
         if not skip_date_parsing:
-            start = None
-            start_start = None
-            start_end = None
-            end = None
-            end_start = None
-            end_end = None
-
-            if self.start_date_written:
-                start, start_start, start_end = DateParser.parse_date(
-                    self.start_date_written
-                )
-                # DateParser returns datetime, but we want dates without time
-                if start:
-                    start = start.date()
-                if start_start:
-                    start_start = start_start.date()
-                if start_end:
-                    start_end = start_end.date()
-
-            if self.end_date_written:
-                end, end_start, end_end = DateParser.parse_date(self.end_date_written)
-                # DateParser returns datetime, but we want dates without time
-                if end:
-                    end = end.date()
-                if end_start:
-                    end_start = end_start.date()
-                if end_end:
-                    end_end = end_end.date()
-
-            self.start_date = start
-            self.start_start_date = start_start
-            self.start_end_date = start_end
-            self.end_date = end
-            self.end_start_date = end_start
-            self.end_end_date = end_end
+            dates, errors = derive_dates(self.start_date_written, self.end_date_written)
+            for error in errors:
+                logger.warning(error)
+            for field, date in dates.items():
+                setattr(self, field, date)
 
         super().save(*args, **kwargs)
 
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apis_ontology.graphexport import EXPORT_CHUNK_SIZE, write_graph
+
+
+class Command(BaseCommand):
+    help = "Export all entities and relations as compressed numpy .npz archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path of the .npz file to write")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="Number of rows fetched from the database at once")
+
+    def handle(self, *args, **options):
+        with open(options["path"], "wb") as export:
+            write_graph(export, options["chunk_size"])
+        self.stdout.write(f"Wrote network export to {options['path']}")
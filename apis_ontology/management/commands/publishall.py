@@ -1,19 +1,110 @@
+import contextlib
+import itertools
+
 from django.core.management.base import BaseCommand
+from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_delete
 
-from apis_core.apis_entities.models import TempEntityClass
-from apis_core.apis_metainfo.models import Collection
+from apis_core.collections.models import SkosCollection, SkosCollectionContentObject
+from apis_ontology.caching import bump_generation
+from apis_ontology.facets import invalidate_facet_summaries
+from apis_ontology.models import SicprodMixin
+from apis_ontology.publication import PUBLISHED_COLLECTION
+from apis_ontology.signals import invalidate_list_caches, remove_alternative_labels, remove_relation_neighbors, update_published_flag
 
-from django.contrib.contenttypes.models import ContentType
+
+@contextlib.contextmanager
+def membership_receivers_disconnected():
+    """
+    Temporarily disconnect the `post_delete` receivers of this project
+    that get sent the deletion of a membership. As long as no other
+    app listens, Django deletes the memberships without loading them.
+    """
+    receivers = [
+        (invalidate_list_caches, None),
+        (remove_relation_neighbors, None),
+        (remove_alternative_labels, None),
+        (update_published_flag, SkosCollectionContentObject),
+    ]
+    for receiver, sender in receivers:
+        post_delete.disconnect(receiver, sender=sender)
+    try:
+        yield
+    finally:
+        for receiver, sender in receivers:
+            post_delete.connect(receiver, sender=sender)
 
 
 class Command(BaseCommand):
     help = "Add all entities to `published` collection"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--unpublish", action="store_true", help="Remove all entities from the `published` collection instead")
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Number of memberships created at once")
+
     def handle(self, *args, **options):
-        published, _ = Collection.objects.get_or_create(name="published")
+        published = SkosCollection.objects.filter(name=PUBLISHED_COLLECTION).order_by("pk").first()
+        if published is None and not options["dry_run"]:
+            published = SkosCollection.objects.create(name=PUBLISHED_COLLECTION)
+        models = [content_type.model_class() for content_type in ContentType.objects.filter(app_label="apis_ontology")]
+        models = [model for model in models if model and issubclass(model, SicprodMixin)]
+
+        changed = []
+        for model in models:
+            content_type = ContentType.objects.get_for_model(model)
+            if options["unpublish"]:
+                count = self.unpublish(content_type, options["batch_size"], options["dry_run"])
+            else:
+                count = self.publish(published, model, content_type, options["batch_size"], options["dry_run"])
+            if count and not options["dry_run"]:
+                model.update_published()
+                changed.append(content_type)
+            action = "unpublish" if options["unpublish"] else "publish"
+            if options["dry_run"]:
+                action = f"would {action}"
+            else:
+                action = f"{action}ed"
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {action} {count}")
+
+        # the memberships are created and deleted without the receivers
+        if changed:
+            invalidate_facet_summaries(changed)
+            bump_generation(changed)
+
+    def publish(self, published, model, content_type, batch_size, dry_run) -> int:
+        """
+        Add the entities of `model` that are not in the collection yet
+        using `bulk_create` in batches. There is no unique constraint on
+        the memberships, so the existing ones are excluded beforehand.
+        """
+        # an entity in any collection named `published` is published
+        members = SkosCollectionContentObject.objects.filter(collection__name=PUBLISHED_COLLECTION, content_type=content_type).values("object_id")
+        missing = model.objects.exclude(pk__in=members).order_by("pk").values_list("pk", flat=True)
+        count = 0
+        for batch in itertools.batched(missing.iterator(chunk_size=batch_size), batch_size):
+            if not dry_run:
+                SkosCollectionContentObject.objects.bulk_create([
+                    SkosCollectionContentObject(collection=published, content_type=content_type, object_id=pk) for pk in batch
+                ], ignore_conflicts=True)
+            count += len(batch)
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {count}", ending="\r")
+        return count
 
-        for model in ContentType.objects.filter(app_label='apis_ontology'):
-            if model.model_class():
-                if issubclass(model.model_class(), TempEntityClass):
-                    for entity in model.model_class().objects.all():
-                        entity.collection.add(published)
+    def unpublish(self, content_type, batch_size, dry_run) -> int:
+        """
+        Delete the memberships of `content_type` in batches, using the
+        public `delete` instead of a private raw delete. The receivers
+        that update the flags and caches per membership are disconnected
+        meanwhile; `handle` does that once for all of them.
+        """
+        members = SkosCollectionContentObject.objects.filter(collection__name=PUBLISHED_COLLECTION, content_type=content_type)
+        if dry_run:
+            return members.count()
+        count = 0
+        pks = list(members.order_by("pk").values_list("pk", flat=True))
+        with membership_receivers_disconnected():
+            for batch in itertools.batched(pks, batch_size):
+                deleted, _ = SkosCollectionContentObject.objects.filter(pk__in=batch).delete()
+                count += deleted
+        return count
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apis_ontology.models import RelationNeighbor
+
+
+class Command(BaseCommand):
+    help = "Rebuild the relation neighbor index from the relations"
+
+    def handle(self, *args, **options):
+        RelationNeighbor.rebuild()
+        self.stdout.write(f"Indexed {RelationNeighbor.objects.count()} relation neighbors")
@@ -0,0 +1,69 @@
+import itertools
+import multiprocessing
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+
+from apis_ontology.caching import bump_generation
+from apis_ontology.facets import invalidate_facet_summaries
+from apis_ontology.legacydatemixin import DATE_FIELDS, LegacyDateMixin, derive_dates
+
+
+class Command(BaseCommand):
+    help = "Re-derive the date fields of all entities from their written dates"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Number of entities to parse and update at once")
+        parser.add_argument("--workers", type=int, default=1, help="Number of processes used for parsing")
+        parser.add_argument("--dry-run", action="store_true", help="Only report the changes, do not write them")
+
+    def handle(self, *args, **options):
+        models = [model for model in apps.get_app_config("apis_ontology").get_models() if issubclass(model, LegacyDateMixin)]
+        pool = None
+        if options["workers"] > 1:
+            # the workers only parse strings, forking spares them the django setup
+            pool = multiprocessing.get_context("fork").Pool(options["workers"])
+        try:
+            for model in models:
+                self.rederive(model, pool, options["chunk_size"], options["dry_run"])
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    def rederive(self, model, pool, chunk_size, dry_run):
+        """
+        Parse the written dates of all instances of `model` chunk by
+        chunk and write the rows whose derived dates changed using
+        `bulk_update`, which bypasses `save` and thus the signals,
+        the history and the auditlog.
+        """
+        checked = updated = 0
+        failures = []
+        rows = model.objects.order_by("pk").values_list("pk", "start_date_written", "end_date_written", *DATE_FIELDS)
+        for chunk in itertools.batched(rows.iterator(chunk_size=chunk_size), chunk_size):
+            written = [(start, end) for _, start, end, *_ in chunk]
+            if pool is not None:
+                results = pool.starmap(derive_dates, written)
+            else:
+                results = itertools.starmap(derive_dates, written)
+            changed = []
+            for (pk, _, _, *current), (dates, errors) in zip(chunk, results):
+                failures.extend((pk, error) for error in errors)
+                if [dates[field] for field in DATE_FIELDS] != current:
+                    changed.append(model(pk=pk, **dates))
+            if changed and not dry_run:
+                model.objects.bulk_update(changed, DATE_FIELDS)
+            checked += len(chunk)
+            updated += len(changed)
+
+        if updated and not dry_run:
+            content_type = ContentType.objects.get_for_model(model)
+            invalidate_facet_summaries([content_type])
+            bump_generation([content_type])
+
+        for pk, error in failures:
+            self.stderr.write(f"{model._meta.verbose_name} {pk}: {error}")
+        action = "would be updated" if dry_run else "updated"
+        self.stdout.write(f"{model._meta.verbose_name_plural}: {checked} checked, {updated} {action}, {len(failures)} parse failures")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apis_ontology.models import ReferenceScan
+
+
+class Command(BaseCommand):
+    help = "Resolve the scans of all references that have no scan or a stale one"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=500, help="Number of references resolved and written at once")
+
+    def handle(self, *args, **options):
+        ReferenceScan.resolve_stale(options["chunk_size"])
+        self.stdout.write(f"Resolved scans, {ReferenceScan.objects.count()} stored")
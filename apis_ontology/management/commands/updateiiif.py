@@ -3,6 +3,8 @@ import json
 import pathlib
 import requests
 
+from apis_ontology.models import ReferenceScan
+
 
 class Command(BaseCommand):
     help = "Update iiif cache"
@@ -16,3 +18,4 @@ class Command(BaseCommand):
         except Exception as e:
             print(e)
         pathlib.Path("data/iiif.json").write_text((json.dumps(full_dict, indent=2)))
+        ReferenceScan.resolve_stale()
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.9 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis_bibsonomy', '0005_zoteroentry'),
+        ('apis_ontology', '0022_cachegeneration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceScan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(blank=True, max_length=255)),
+                ('scanfile', models.CharField(blank=True, max_length=255, null=True)),
+                ('iiif_version', models.BigIntegerField(default=0)),
+                ('reference', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='scan', to='apis_bibsonomy.reference')),
+            ],
+        ),
+    ]
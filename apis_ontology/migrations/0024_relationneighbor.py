@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-18 13:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_neighbors(apps, schema_editor):
+    """
+    Fill the index from the relations of all relation classes
+    """
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    RelationNeighbor = apps.get_model("apis_ontology", "RelationNeighbor")
+    relation_models = [model for model in apps.get_app_config("apis_ontology").get_models() if any(parent._meta.label == "relations.Relation" for parent in model._meta.parents)]
+    for model in relation_models:
+        relation_type = ContentType.objects.get_for_model(model)
+        relations = model.objects.filter(subj_object_id__isnull=False, obj_object_id__isnull=False).order_by().values_list("pk", "subj_content_type_id", "subj_object_id", "obj_content_type_id", "obj_object_id")
+        neighbors = []
+        for pk, subj_ct, subj_id, obj_ct, obj_id in relations.iterator(chunk_size=1000):
+            neighbors.append(RelationNeighbor(relation_id=pk, relation_type=relation_type, entity_content_type_id=subj_ct, entity_id=subj_id, neighbor_content_type_id=obj_ct, neighbor_id=obj_id))
+            neighbors.append(RelationNeighbor(relation_id=pk, relation_type=relation_type, entity_content_type_id=obj_ct, entity_id=obj_id, neighbor_content_type_id=subj_ct, neighbor_id=subj_id))
+            if len(neighbors) >= 1000:
+                RelationNeighbor.objects.bulk_create(neighbors)
+                neighbors = []
+        RelationNeighbor.objects.bulk_create(neighbors)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis_ontology', '0023_referencescan'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('relations', '0003_relation_relations_r_subj_content_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelationNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_id', models.PositiveIntegerField()),
+                ('neighbor_id', models.PositiveIntegerField()),
+                ('entity_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('neighbor_content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+                ('relation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='relations.relation')),
+                ('relation_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['neighbor_content_type', 'neighbor_id', 'entity_content_type', 'entity_id'], name='relneighbor_neighbor_idx'), models.Index(fields=['entity_content_type', 'entity_id'], name='relneighbor_entity_idx')],
+            },
+        ),
+        migrations.RunPython(build_neighbors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:20
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_alternative_labels(apps, schema_editor):
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    AlternativeLabel = apps.get_model("apis_ontology", "AlternativeLabel")
+    entity_models = [model for model in apps.get_app_config("apis_ontology").get_models() if any(parent._meta.label == "apis_metainfo.RootObject" for parent in model._meta.parents) and any(field.name == "alternative_label" for field in model._meta.fields)]
+    for model in entity_models:
+        content_type = ContentType.objects.get_for_model(model)
+        labels = []
+        for pk, alternative_label in model.objects.exclude(alternative_label__isnull=True).exclude(alternative_label="").values_list("pk", "alternative_label").iterator(chunk_size=1000):
+            for label in alternative_label.splitlines():
+                if label := label.strip():
+                    labels.append(AlternativeLabel(content_type=content_type, object_id=pk, label=label, normalized_label=" ".join(label.casefold().split())))
+            if len(labels) >= 1000:
+                AlternativeLabel.objects.bulk_create(labels)
+                labels = []
+        AlternativeLabel.objects.bulk_create(labels)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis_ontology', '0025_trigram_indexes'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlternativeLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('label', models.TextField()),
+                ('normalized_label', models.TextField()),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='altlabel_object_idx'), models.Index(fields=['normalized_label'], name='altlabel_normalized_idx', opclasses=['text_pattern_ops']), django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass('normalized_label', name='gin_trgm_ops'), name='altlabel_normalized_trgm')],
+            },
+        ),
+        migrations.RunPython(fill_alternative_labels, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.9 on 2026-10-18 14:51
+
+from django.db import migrations, models
+
+
+def update_published(apps, schema_editor):
+    """
+    Set the `published` flags according to the `published` collection
+    """
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    SkosCollectionContentObject = apps.get_model("collections", "SkosCollectionContentObject")
+    entity_models = [model for model in apps.get_app_config("apis_ontology").get_models() if any(parent._meta.label == "apis_metainfo.RootObject" for parent in model._meta.parents) and any(field.name == "published" for field in model._meta.fields)]
+    for model in entity_models:
+        content_type = ContentType.objects.get_for_model(model)
+        members = SkosCollectionContentObject.objects.filter(content_type=content_type, collection__name="published").values("object_id")
+        model.objects.filter(pk__in=members).update(published=True)
+        model.objects.exclude(pk__in=members).update(published=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis_ontology', '0026_alternativelabel'),
+        ('collections', '0004_remove_skoscollection_unique_name_parent_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='event',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='function',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='institution',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='person',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='place',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='salary',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='versionevent',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='versionfunction',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='versioninstitution',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='versionperson',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='versionplace',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='versionsalary',
+            name='published',
+            field=models.BooleanField(db_index=True, default=False, editable=False),
+        ),
+        migrations.RunPython(update_published, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-18 15:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+
+PUBLIC_SALARY_TYPES = ["Sold", "Provision", "Sonstiges"]
+
+
+def mark_hidden_salary_relations(apps, schema_editor):
+    """
+    Mark the relations that have a salary with a non public type as
+    subject or object
+    """
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    Relation = apps.get_model("relations", "Relation")
+    Salary = apps.get_model("apis_ontology", "Salary")
+    HiddenSalaryRelation = apps.get_model("apis_ontology", "HiddenSalaryRelation")
+    salary_type = ContentType.objects.get_for_model(Salary)
+    hidden = Salary.objects.exclude(typ__in=PUBLIC_SALARY_TYPES).values("pk")
+    relations = Relation.objects.filter(Q(subj_content_type=salary_type, subj_object_id__in=hidden) | Q(obj_content_type=salary_type, obj_object_id__in=hidden))
+    markers = (HiddenSalaryRelation(relation_id=pk) for pk in relations.order_by().values_list("pk", flat=True).iterator(chunk_size=1000))
+    HiddenSalaryRelation.objects.bulk_create(markers, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis_ontology', '0027_published_flag'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('relations', '0003_relation_relations_r_subj_content_type_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HiddenSalaryRelation',
+            fields=[
+                ('relation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='hidden_salary', serialize=False, to='relations.relation')),
+            ],
+        ),
+        migrations.RunPython(mark_hidden_salary_relations, migrations.RunPython.noop),
+    ]
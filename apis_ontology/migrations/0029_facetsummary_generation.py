@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apis_ontology', '0028_hiddensalaryrelation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='facetsummary',
+            name='generation',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -1,5 +1,10 @@
-from django.db import models
+import logging
+
+from django.db import models, transaction
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.contrib.contenttypes.models import ContentType
+from apis_bibsonomy.models import Reference
 from apis_core.apis_entities.models import AbstractEntity
 from .legacydatemixin import LegacyDateMixin
 from apis_core.collections.models import SkosCollection, SkosCollectionContentObject
@@ -8,9 +13,13 @@ from apis_core.entities.abc import E53_Place
 from apis_core.entities.abc import Entity
 from apis_core.relations.models import Relation
 from django_interval.fields import FuzzyDateParserField
+from .iiif import get_iiif_index, get_folio
+from .bibtex import get_parsed_bibtex
 
 from auditlog.registry import auditlog
 
+logger = logging.getLogger(__name__)
+
 
 class SicprodMixin(Entity, models.Model):
     """ A mixin providing generic fields and functionality for all Sicprod Models """
@@ -18,7 +27,9 @@ class SicprodMixin(Entity, models.Model):
     status = models.CharField(max_length=100, blank=True)
     references = models.TextField(blank=True, null=True)
     notes = models.TextField(blank=True, null=True)
-    published = models.BooleanField(default=False)
+    # mirrors the membership in the `published` collection, see
+    # `update_published`. Not editable, so `duplicate` and forms do not copy or set it
+    published = models.BooleanField(default=False, db_index=True, editable=False)
     metadata = models.JSONField(null=True, blank=True, editable=False)
 
     class Meta:
@@ -30,11 +41,30 @@ class SicprodMixin(Entity, models.Model):
         return "(ID: {})".format(self.id)
 
     def sicprod_collections(self):
-        my_sccos = SkosCollection.objects.by_instance(instance=self)
-        sicprod_c = SkosCollection.objects.get(name="sicprod")
-        collection_c_t = ContentType.objects.get_for_model(SkosCollection)
-        sccos = SkosCollectionContentObject.objects.filter(collection=sicprod_c, content_type=collection_c_t)
-        return my_sccos.filter(id__in=[scco.content_object.id for scco in sccos])
+        # imported here, the publication module depends on the models
+        from apis_ontology.publication import get_sicprod_collection_ids
+        return SkosCollection.objects.by_instance(instance=self).filter(id__in=get_sicprod_collection_ids())
+
+    def get_merge_published_value(self, other):
+        # the flag follows the collection membership, see `update_published`
+        return self.published
+
+    @classmethod
+    def update_published(cls, object_ids=None):
+        """
+        Set the `published` flag of all instances - or of the instances
+        with the given ids - according to their membership in the
+        `published` collection. Uses `update`, so no signals are sent.
+        """
+        # imported here, the publication module depends on the models
+        from apis_ontology.publication import PUBLISHED_COLLECTION
+        content_type = ContentType.objects.get_for_model(cls)
+        members = SkosCollectionContentObject.objects.filter(content_type=content_type, collection__name=PUBLISHED_COLLECTION).values("object_id")
+        instances = cls.objects.all()
+        if object_ids is not None:
+            instances = instances.filter(pk__in=object_ids)
+        instances.filter(pk__in=members, published=False).update(published=True)
+        instances.filter(published=True).exclude(pk__in=members).update(published=False)
 
 
 class Person(VersionMixin, SicprodMixin, LegacyDateMixin, AbstractEntity):
@@ -50,6 +80,11 @@ class Person(VersionMixin, SicprodMixin, LegacyDateMixin, AbstractEntity):
 
     class Meta:
         ordering = ["name", "first_name"]
+        indexes = [
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="person_name_trgm"),
+            GinIndex(OpClass(Upper("first_name"), name="gin_trgm_ops"), name="person_first_name_trgm"),
+            GinIndex(OpClass(Upper("alternative_label"), name="gin_trgm_ops"), name="person_altlabel_trgm"),
+        ]
 
     def __str__(self):
         return "{}, {} (ID: {})".format(self.name, self.first_name, self.id)
@@ -65,6 +100,10 @@ class Function(VersionMixin, SicprodMixin, LegacyDateMixin, AbstractEntity):
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="function_name_trgm"),
+            GinIndex(OpClass(Upper("alternative_label"), name="gin_trgm_ops"), name="function_altlabel_trgm"),
+        ]
 
 
 class Place(VersionMixin, SicprodMixin, LegacyDateMixin, E53_Place, AbstractEntity):
@@ -96,6 +135,10 @@ class Institution(VersionMixin, SicprodMixin, LegacyDateMixin, AbstractEntity):
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="institution_name_trgm"),
+            GinIndex(OpClass(Upper("alternative_label"), name="gin_trgm_ops"), name="institution_altlabel_trgm"),
+        ]
 
 
 class Event(VersionMixin, SicprodMixin, LegacyDateMixin, AbstractEntity):
@@ -112,6 +155,11 @@ class Event(VersionMixin, SicprodMixin, LegacyDateMixin, AbstractEntity):
         ordering = ["name"]
 
 
+# the salary types that are shown publicly, relations to salaries of
+# other types are hidden
+PUBLIC_SALARY_TYPES = ["Sold", "Provision", "Sonstiges"]
+
+
 class Salary(VersionMixin, SicprodMixin, LegacyDateMixin, AbstractEntity):
     """
     Ein Gehalt ist die Menge an Geld die eine Person als Gegenleistung erhalten hat. Das Gehalt muss keine wiederkehrende Zahlung sein.
@@ -1164,3 +1212,318 @@ class IstMoeglicherweiseSpezifiziertAls(VersionMixin, Relation):
     def reverse_name(self) -> str:
         return "ist möglicherweise verallgemeinert als"
 
+
+
+class FacetSummary(models.Model):
+    """
+    Precomputed facets of the unfiltered API list of a content type.
+    `public` separates the list anonymous users get from the one
+    authenticated users get. The signals remove the summaries once the
+    underlying data changes and the next list request recreates them.
+    `generation` is the cache generation of the content type the facets
+    were calculated for, a summary of an older generation is outdated.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    public = models.BooleanField(default=False)
+    facets = models.JSONField(default=dict)
+    generation = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["content_type", "public"], name="unique_facetsummary_content_type_public"),
+        ]
+
+
+class CacheGeneration(models.Model):
+    """
+    A counter per content type that is part of the cache keys of data
+    derived from instances of that content type. The signals increase
+    the counter when the data changes, which invalidates all the cache
+    entries at once - in all processes, as the counter lives in the
+    database.
+    """
+    content_type = models.OneToOneField(ContentType, on_delete=models.CASCADE)
+    generation = models.PositiveBigIntegerField(default=0)
+
+
+class ReferenceScan(models.Model):
+    """
+    The scan a bibsonomy Reference points to. `title` is the normalized
+    title if there are scans of the referenced work and `scanfile` is
+    empty if the folio of the reference could not be resolved to a scan.
+    `iiif_version` is the version of the IIIF index the scan was
+    resolved with, so the scans are resolved again once it changes.
+    """
+    reference = models.OneToOneField(Reference, on_delete=models.CASCADE, related_name="scan")
+    title = models.CharField(max_length=255, blank=True)
+    scanfile = models.CharField(max_length=255, blank=True, null=True)
+    iiif_version = models.BigIntegerField(default=0)
+
+    @classmethod
+    def build(cls, reference):
+        """
+        Resolve the scan of `reference` without saving it. A reference
+        whose bibtex or folio can not be resolved gets an empty scan.
+        """
+        index = get_iiif_index()
+        scan = cls(reference=reference, title="", scanfile=None, iiif_version=index.version)
+        try:
+            title = get_parsed_bibtex(reference).title
+            if title is not None and title in index.titles:
+                scan.title = title
+                scan.scanfile = get_folio(reference)
+        except Exception as e:
+            logger.warning("Could not resolve scan of %s: %s", reference, e)
+        return scan
+
+    @classmethod
+    def resolve(cls, reference):
+        scan = cls.build(reference)
+        scan, _ = cls.objects.update_or_create(reference=reference, defaults={"title": scan.title, "scanfile": scan.scanfile, "iiif_version": scan.iiif_version})
+        return scan
+
+    @classmethod
+    def for_reference(cls, reference):
+        """
+        The stored scan of `reference`, or an unsaved one if it is
+        missing or stale. Storing the scans is left to `resolve_stale`,
+        so reading them never writes.
+        """
+        try:
+            scan = reference.scan
+        except cls.DoesNotExist:
+            scan = None
+        if scan is None or scan.iiif_version != get_iiif_index().version:
+            scan = cls.build(reference)
+        return scan
+
+    @classmethod
+    def resolve_stale(cls, chunk_size=500):
+        """
+        Resolve the scans of all references that were not resolved
+        yet or that were resolved with another IIIF index version.
+        The references are read and the scans written in chunks.
+        """
+        stale = Reference.objects.exclude(scan__iiif_version=get_iiif_index().version).order_by("pk")
+        chunk = []
+        for reference in stale.iterator(chunk_size=chunk_size):
+            chunk.append(cls.build(reference))
+            if len(chunk) >= chunk_size:
+                cls.save_chunk(chunk)
+                chunk = []
+        cls.save_chunk(chunk)
+
+    @classmethod
+    def save_chunk(cls, scans):
+        cls.objects.bulk_create(scans, update_conflicts=True, unique_fields=["reference"], update_fields=["title", "scanfile", "iiif_version"])
+
+
+class RelationNeighbor(models.Model):
+    """
+    Symmetric index of the relations between entities: every relation
+    is stored twice, once from the point of view of the subject and
+    once from the point of view of the object. This allows to look up
+    the neighbors of an entity - and the entities with a given
+    neighbor - with one indexed query. The signals keep the index in
+    sync with the relations.
+    """
+    relation = models.ForeignKey(Relation, on_delete=models.CASCADE, related_name="+")
+    relation_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name="+")
+    entity_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name="+")
+    entity_id = models.PositiveIntegerField()
+    neighbor_content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name="+")
+    neighbor_id = models.PositiveIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["neighbor_content_type", "neighbor_id", "entity_content_type", "entity_id"], name="relneighbor_neighbor_idx"),
+            models.Index(fields=["entity_content_type", "entity_id"], name="relneighbor_entity_idx"),
+        ]
+
+    @classmethod
+    def build(cls, relation) -> list:
+        """
+        Create the unsaved index rows of `relation`
+        """
+        if relation.subj_object_id is None or relation.obj_object_id is None:
+            return []
+        relation_type = ContentType.objects.get_for_model(relation)
+        subj = (relation.subj_content_type_id, relation.subj_object_id)
+        obj = (relation.obj_content_type_id, relation.obj_object_id)
+        return [
+            cls(relation_id=relation.pk, relation_type=relation_type,
+                entity_content_type_id=entity[0], entity_id=entity[1],
+                neighbor_content_type_id=neighbor[0], neighbor_id=neighbor[1])
+            for entity, neighbor in [(subj, obj), (obj, subj)]
+        ]
+
+    @classmethod
+    def update_for(cls, relation):
+        cls.objects.filter(relation_id=relation.pk).delete()
+        cls.objects.bulk_create(cls.build(relation))
+
+    @classmethod
+    def rebuild(cls, chunk_size=1000):
+        """
+        Recreate the whole index from the relations
+        """
+        cls.objects.all().delete()
+        relations = Relation.objects.select_subclasses().order_by("pk")
+        chunk = []
+        for relation in relations.iterator(chunk_size=chunk_size):
+            chunk.extend(cls.build(relation))
+            if len(chunk) >= chunk_size:
+                cls.objects.bulk_create(chunk)
+                chunk = []
+        cls.objects.bulk_create(chunk)
+
+    @classmethod
+    def merge(cls, instance, entities):
+        """
+        Point the index rows of the merged `entities` to `instance`,
+        like the merge does with the relations themselves
+        """
+        for entity in entities:
+            content_type = ContentType.objects.get_for_model(entity)
+            cls.objects.filter(entity_content_type=content_type, entity_id=entity.id).update(entity_id=instance.id)
+            cls.objects.filter(neighbor_content_type=content_type, neighbor_id=entity.id).update(neighbor_id=instance.id)
+
+    @classmethod
+    def remove_entity(cls, entity):
+        """
+        Remove the index rows of a deleted entity. Its relations are
+        kept with an empty subject or object, so they drop out of the
+        index as well.
+        """
+        content_type = ContentType.objects.get_for_model(entity)
+        cls.objects.filter(entity_content_type=content_type, entity_id=entity.pk).delete()
+        cls.objects.filter(neighbor_content_type=content_type, neighbor_id=entity.pk).delete()
+
+
+def normalize_label(label: str) -> str:
+    return " ".join(label.casefold().split())
+
+
+class AlternativeLabel(models.Model):
+    """
+    The lines of the `alternative_label` fields of the entities, one
+    row per label. `normalized_label` is the casefolded label with
+    normalized whitespace and is indexed for exact, prefix and trigram
+    lookups. The signals keep the labels in sync with the entities.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, related_name="+")
+    object_id = models.PositiveIntegerField()
+    label = models.TextField()
+    normalized_label = models.TextField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["content_type", "object_id"], name="altlabel_object_idx"),
+            models.Index(fields=["normalized_label"], opclasses=["text_pattern_ops"], name="altlabel_normalized_idx"),
+            GinIndex(OpClass("normalized_label", name="gin_trgm_ops"), name="altlabel_normalized_trgm"),
+        ]
+
+    @staticmethod
+    def split(alternative_label) -> list[str]:
+        return [label.strip() for label in (alternative_label or "").splitlines() if label.strip()]
+
+    @classmethod
+    def sync(cls, instance):
+        """
+        Replace the stored labels of `instance` if they changed
+        """
+        content_type = ContentType.objects.get_for_model(instance)
+        labels = cls.split(instance.alternative_label)
+        stored = cls.objects.filter(content_type=content_type, object_id=instance.pk)
+        if list(stored.order_by("pk").values_list("label", flat=True)) != labels:
+            stored.delete()
+            cls.objects.bulk_create([cls(content_type=content_type, object_id=instance.pk, label=label, normalized_label=normalize_label(label)) for label in labels])
+
+    @classmethod
+    def remove(cls, instance):
+        content_type = ContentType.objects.get_for_model(instance)
+        cls.objects.filter(content_type=content_type, object_id=instance.pk).delete()
+
+    @classmethod
+    def matching(cls, model, value: str):
+        """
+        The labels of `model` instances that contain `value` or contain
+        a word similar to it, compared in normalized form
+        """
+        value = normalize_label(value)
+        labels = cls.objects.filter(content_type=ContentType.objects.get_for_model(model))
+        return labels.filter(models.Q(normalized_label__contains=value) | models.Q(normalized_label__trigram_word_similar=value))
+
+    @classmethod
+    def duplicates(cls):
+        """
+        The normalized labels that are shared by multiple entities
+        of the same content type
+        """
+        labels = cls.objects.values("content_type", "normalized_label").annotate(entities=models.Count("object_id", distinct=True))
+        return labels.filter(entities__gt=1).order_by("content_type", "normalized_label")
+
+
+class HiddenSalaryRelation(models.Model):
+    """
+    Marks the relations that have a salary of a type that is not in
+    `PUBLIC_SALARY_TYPES` as subject or object. The relation lists
+    exclude the marked relations with an indexed join instead of a
+    subquery over the salaries. The signals keep the markers in sync
+    with the relations and the salaries.
+    """
+    relation = models.OneToOneField(Relation, on_delete=models.CASCADE, primary_key=True, related_name="hidden_salary")
+
+    @staticmethod
+    def salary_relations(salaries):
+        """
+        The relations that have one of `salaries` as subject or object
+        """
+        salary_type = ContentType.objects.get_for_model(Salary)
+        return Relation.objects.filter(
+            models.Q(subj_content_type=salary_type, subj_object_id__in=salaries) |
+            models.Q(obj_content_type=salary_type, obj_object_id__in=salaries)
+        )
+
+    @classmethod
+    def refresh(cls, relations=None):
+        """
+        Recompute the markers of the `relations` queryset, or of all
+        relations
+        """
+        relations = Relation.objects.all() if relations is None else relations
+        relation_ids = relations.order_by().values("pk")
+        hidden = cls.salary_relations(Salary.objects.exclude(typ__in=PUBLIC_SALARY_TYPES).values("pk"))
+        hidden = hidden.filter(pk__in=relation_ids).order_by().values_list("pk", flat=True)
+        with transaction.atomic():
+            cls.objects.filter(relation__in=relation_ids).delete()
+            cls.objects.bulk_create([cls(relation_id=pk) for pk in hidden.iterator(chunk_size=1000)], batch_size=1000)
+
+    @classmethod
+    def update_for(cls, relation):
+        cls.refresh(Relation.objects.filter(pk=relation.pk))
+
+    @classmethod
+    def update_salary(cls, salary):
+        cls.refresh(cls.salary_relations([salary.pk]))
+
+    @classmethod
+    def merge(cls, salary, salaries):
+        """
+        Mark or unmark the relations of `salary` and of the merged
+        `salaries` by the type of `salary`. The relations of the merged
+        salaries are moved to `salary` only after this runs.
+        """
+        relation_ids = cls.salary_relations([salary.pk, *(other.pk for other in salaries)]).order_by().values("pk")
+        with transaction.atomic():
+            cls.objects.filter(relation__in=relation_ids).delete()
+            if salary.typ not in PUBLIC_SALARY_TYPES:
+                cls.objects.bulk_create([cls(relation_id=pk) for pk in relation_ids.values_list("pk", flat=True)], batch_size=1000)
+
+    @classmethod
+    def remove_salary(cls, salary):
+        """
+        Drop the markers that `salary` causes, before it is deleted
+        and its relations lose their subject or object
+        """
+        cls.objects.filter(relation__in=cls.salary_relations([salary.pk]).order_by().values("pk")).delete()
@@ -0,0 +1,79 @@
+import functools
+
+from crum import get_current_request
+from django.contrib.contenttypes.models import ContentType
+from apis_core.collections.models import SkosCollection, SkosCollectionContentObject
+from apis_ontology.caching import get_generation
+
+PUBLISHED_COLLECTION = "published"
+SICPROD_COLLECTION = "sicprod"
+
+
+def get_request_cache() -> dict:
+    """
+    A dict that lives as long as the current request, or a new
+    dict if there is no current request
+    """
+    request = get_current_request()
+    if request is None:
+        return {}
+    if not hasattr(request, "_sicprod_publication"):
+        request._sicprod_publication = {}
+    return request._sicprod_publication
+
+
+@functools.lru_cache(maxsize=8)
+def load_published_collection_ids(generation: int) -> tuple[int]:
+    return tuple(SkosCollection.objects.filter(name=PUBLISHED_COLLECTION).order_by("pk").values_list("pk", flat=True))
+
+
+@functools.lru_cache(maxsize=8)
+def load_sicprod_collection_ids(generation: int) -> frozenset[int]:
+    collection_type = ContentType.objects.get_for_model(SkosCollection)
+    sccos = SkosCollectionContentObject.objects.filter(collection__name=SICPROD_COLLECTION, content_type=collection_type)
+    return frozenset(sccos.values_list("object_id", flat=True))
+
+
+@functools.lru_cache(maxsize=64)
+def load_published_ids(content_type_id: int, generation: int, collection_ids: tuple[int]) -> frozenset[int]:
+    sccos = SkosCollectionContentObject.objects.filter(content_type_id=content_type_id, collection_id__in=collection_ids)
+    return frozenset(sccos.values_list("object_id", flat=True))
+
+
+def get_published_collection_ids() -> tuple[int]:
+    """
+    The ids of the collections named `published`. They are cached
+    per request and per process, the cache generation of the
+    SkosCollection content type invalidates the process cache.
+    """
+    cache = get_request_cache()
+    if "collection_ids" not in cache:
+        generation = get_generation(ContentType.objects.get_for_model(SkosCollection))
+        cache["collection_ids"] = load_published_collection_ids(generation)
+    return cache["collection_ids"]
+
+
+def get_published_ids(content_type) -> frozenset[int]:
+    """
+    The ids of the published objects of `content_type`. They are
+    cached per request and per process, the cache generation of the
+    content type invalidates the process cache.
+    """
+    content_type_id = getattr(content_type, "pk", content_type)
+    cache = get_request_cache()
+    if content_type_id not in cache:
+        generation = get_generation(content_type_id)
+        cache[content_type_id] = load_published_ids(content_type_id, generation, get_published_collection_ids())
+    return cache[content_type_id]
+
+
+def get_sicprod_collection_ids() -> frozenset[int]:
+    """
+    The ids of the collections that are part of the `sicprod`
+    collection. They are cached like the published collection ids.
+    """
+    cache = get_request_cache()
+    if "sicprod_collection_ids" not in cache:
+        generation = get_generation(ContentType.objects.get_for_model(SkosCollection))
+        cache["sicprod_collection_ids"] = load_sicprod_collection_ids(generation)
+    return cache["sicprod_collection_ids"]
@@ -1,2 +1,5 @@
+from apis_ontology.models import PUBLIC_SALARY_TYPES
+
+
 def SalaryViewSetQueryset(queryset):
-    return queryset.filter(typ__in=["Sold", "Provision", "Sonstiges"])
+    return queryset.filter(typ__in=PUBLIC_SALARY_TYPES)
@@ -1,7 +1,6 @@
-import json
 import logging
 import re
-import pathlib
+from collections import defaultdict
 from rest_framework import serializers
 from apis_core.generic.serializers import GenericHyperlinkedModelSerializer
 from apis_core.relations.models import Relation
@@ -9,8 +8,10 @@ from django.contrib.contenttypes.models import ContentType
 from apis_bibsonomy.models import Reference
 from drf_spectacular.utils import extend_schema_field
 from drf_spectacular.types import OpenApiTypes
-from apis_ontology.models import Salary
-from django.db.models import Q
+from apis_ontology.models import Salary, ReferenceScan
+from apis_ontology.bibtex import get_parsed_bibtex
+from django.db import models
+from django.db.models import Q, prefetch_related_objects
 
 logger = logging.getLogger(__name__)
 
@@ -19,48 +20,8 @@ FOLIOPATTERN = re.compile(r"^(?P<cleanfolio>\d{1,3}[r|v]).*$")
 ROMANPATTERN = re.compile(r"^(?P<romanfirst>[C|X|L|I|V]{1,9})(?P<rectoverso>[r|v])")
 PAGEPATTERN = re.compile(r"^(?P<page>\d{1,3}).*$")
 
-
-def iiif_titles():
-    data = json.loads(pathlib.Path("data/iiif.json").read_text())
-    return data
-
-
-def normalize_title(title: str) -> str:
-    return title.replace(" ", "_").replace("(", "").replace(")", "")
-
-
-NUMBER = re.compile(r"(?P<number>\d+)")
-
-
-def get_folio(obj):
-    title = normalize_title(obj.get_bibtex["title"])
-    if page := obj.pages_start:
-        page = f"{page:03d}"
-    if obj.folio:
-        page = obj.folio
-        if "-" in obj.folio:
-            page = obj.folio.split("-")[0]
-        if "–" in obj.folio:
-            page = obj.folio.split("–")[0]
-        if page.endswith("v") or page.endswith("r"):
-            suffix = page[-1:]
-        if page:
-            if match := NUMBER.match(page):
-                page = match["number"]
-        if page.endswith("v") or page.endswith("r"):
-            page = page[:-1]
-        try:
-            page = int(page)
-            page = f"{page:03d}{suffix}"
-        except Exception:
-            pass
-    if page:
-        matches = [scanfile for scanfile in iiif_titles()[title] if str(page) in scanfile]
-        if matches:
-            return matches[0]
-    print(obj.folio)
-    print(page)
-    return None
+# up to this number of nodes the network edges are filtered by node id
+NETWORK_EDGE_FILTER_LIMIT = 1000
 
 
 class FixDateMixin:
@@ -123,23 +84,57 @@ class SimplifiedReferenceSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(OpenApiTypes.OBJECT)
     def get_bibtex(self, obj):
-        return obj.get_bibtex
+        # parsed once per bibliographic item and process, see `get_parsed_bibtex`
+        return get_parsed_bibtex(obj).bibtex
 
     def get_scandata(self, obj) -> dict:
         scandata = {}
-        bibtex = obj.get_bibtex
-        if bibtex:
-            title = normalize_title(bibtex["title"])
-            if title in iiif_titles().keys():
-                scandata["title"] = title
-                try:
-                    folio = get_folio(obj)
-                    scandata["pages"] = folio or f"{obj.pages_start}-{obj.pages_end}"
-                except Exception as e:
-                    print(str(obj) + ": " + str(e))
+        scan = ReferenceScan.for_reference(obj)
+        if scan.title:
+            scandata["title"] = scan.title
+            scandata["pages"] = scan.scanfile or f"{obj.pages_start}-{obj.pages_end}"
         return scandata
 
 
+def get_references_for(instances) -> dict:
+    """
+    Load the references of all the instances using one query and
+    return them grouped by (content type id, object id)
+    """
+    content_types = {ContentType.objects.get_for_model(instance).id for instance in instances}
+    object_ids = {instance.id for instance in instances}
+    references = defaultdict(list)
+    for reference in Reference.objects.filter(content_type__in=content_types, object_id__in=object_ids).select_related("scan"):
+        references[(reference.content_type_id, reference.object_id)].append(reference)
+    return references
+
+
+def serialize_references(obj, context):
+    """
+    Serialize the references of `obj`, taken from the references
+    loaded by a list serializer if there are any in the `context`
+    """
+    ct = ContentType.objects.get_for_model(obj)
+    if "references" in context:
+        references = context["references"].get((ct.id, obj.id), [])
+    else:
+        references = Reference.objects.filter(content_type=ct, object_id=obj.id).select_related("scan")
+    return SimplifiedReferenceSerializer(references, many=True).data
+
+
+class RelationListSerializer(serializers.ListSerializer):
+    """
+    Resolve the subjects and objects of all relations grouped by
+    content type and load all their references before serializing,
+    instead of doing it per relation
+    """
+    def to_representation(self, data):
+        relations = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        prefetch_related_objects(relations, "subj", "obj")
+        self.context["references"] = get_references_for(relations)
+        return super().to_representation(relations)
+
+
 class RelationSerializer(FixDateMixin, serializers.Serializer):
     start_date_written = serializers.CharField(source="start")
     end_date_written = serializers.CharField(source="end")
@@ -147,6 +142,9 @@ class RelationSerializer(FixDateMixin, serializers.Serializer):
     end_date = serializers.CharField(source="end_date_sort", allow_null=True)
     notes = serializers.CharField(allow_null=True)
 
+    class Meta:
+        list_serializer_class = RelationListSerializer
+
     def get_fields(self):
         fields = super().get_fields()
         fields["to"] = serializers.SerializerMethodField(method_name="get_to")
@@ -174,9 +172,7 @@ class RelationSerializer(FixDateMixin, serializers.Serializer):
 
     @extend_schema_field(SimplifiedReferenceSerializer(many=True))
     def get_references(self, obj):
-        ct = ContentType.objects.get_for_model(obj)
-        references = Reference.objects.filter(content_type=ct, object_id=obj.id)
-        return SimplifiedReferenceSerializer(references, many=True).data
+        return serialize_references(obj, self.context)
 
 
 class SicprodMixinSerializer(GenericHyperlinkedModelSerializer):
@@ -184,7 +180,46 @@ class SicprodMixinSerializer(GenericHyperlinkedModelSerializer):
         fields = ["name"]
 
 
+def get_relation_types_for(instances) -> dict:
+    """
+    Collect the model names of the objects related to all instances
+    using one grouped query over the content types of the relations,
+    grouped by (content type id, object id) of the instance
+    """
+    object_ids = defaultdict(set)
+    for instance in instances:
+        object_ids[ContentType.objects.get_for_model(instance).id].add(instance.id)
+    relation_types = defaultdict(set)
+    if not object_ids:
+        return relation_types
+    forward = Q()
+    reverse = Q()
+    for content_type, ids in object_ids.items():
+        forward |= Q(subj_content_type=content_type, subj_object_id__in=ids)
+        reverse |= Q(obj_content_type=content_type, obj_object_id__in=ids)
+    forward = Relation.objects.filter(forward, obj_object_id__isnull=False).order_by().values_list("subj_content_type", "subj_object_id", "obj_content_type")
+    reverse = Relation.objects.filter(reverse, subj_object_id__isnull=False).order_by().values_list("obj_content_type", "obj_object_id", "subj_content_type")
+    for content_type, object_id, target_type in forward.union(reverse):
+        relation_types[(content_type, object_id)].add(ContentType.objects.get_for_id(target_type).model)
+    return relation_types
+
+
+class SicprodListSerializer(serializers.ListSerializer):
+    """
+    Determine the relation types and load the references of all
+    entities before serializing, instead of doing it per entity
+    """
+    def to_representation(self, data):
+        instances = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context["relation_types"] = get_relation_types_for(instances)
+        self.context["references"] = get_references_for(instances)
+        return super().to_representation(instances)
+
+
 class SicprodSerializer(FixDateMixin, GenericHyperlinkedModelSerializer):
+    class Meta:
+        list_serializer_class = SicprodListSerializer
+
     def get_fields(self):
         fields = super().get_fields()
         fields["relation_types"] = serializers.SerializerMethodField(method_name="get_relation_types")
@@ -193,6 +228,8 @@ class SicprodSerializer(FixDateMixin, GenericHyperlinkedModelSerializer):
 
     def get_relation_types(self, obj) -> list[str]:
         content_type = ContentType.objects.get_for_model(obj)
+        if "relation_types" in self.context:
+            return self.context["relation_types"].get((content_type.id, obj.id), set())
         forward_relations = Relation.objects.filter(subj_content_type=content_type, subj_object_id=obj.id).prefetch_related("subj", "obj")
         reverse_relations = Relation.objects.filter(obj_content_type=content_type, obj_object_id=obj.id).prefetch_related("subj", "obj")
         relations = set()
@@ -206,20 +243,18 @@ class SicprodSerializer(FixDateMixin, GenericHyperlinkedModelSerializer):
 
     @extend_schema_field(SimplifiedReferenceSerializer(many=True))
     def get_references(self, obj):
-        ct = ContentType.objects.get_for_model(obj)
-        references = Reference.objects.filter(content_type=ct, object_id=obj.id)
-        return SimplifiedReferenceSerializer(references, many=True).data
+        return serialize_references(obj, self.context)
 
 
 class EventSerializer(SicprodSerializer):
-    class Meta:
+    class Meta(SicprodSerializer.Meta):
         fields = ["id", "name", "start_date_written", "end_date_written", "type"]
 
 
 class FunctionSerializer(SicprodSerializer):
     alternative_label = serializers.SerializerMethodField()
 
-    class Meta:
+    class Meta(SicprodSerializer.Meta):
         fields = ["id", "name", "start_date_written", "end_date_written", "alternative_label"]
 
     def get_alternative_label(self, obj) -> list[str]:
@@ -229,7 +264,7 @@ class FunctionSerializer(SicprodSerializer):
 class InstitutionSerializer(SicprodSerializer):
     alternative_label = serializers.SerializerMethodField()
 
-    class Meta:
+    class Meta(SicprodSerializer.Meta):
         fields = ["id", "name", "start_date_written", "end_date_written", "type", "alternative_label"]
 
     def get_alternative_label(self, obj) -> list[str]:
@@ -239,7 +274,7 @@ class InstitutionSerializer(SicprodSerializer):
 class PersonSerializer(SicprodSerializer):
     alternative_label = serializers.SerializerMethodField()
 
-    class Meta:
+    class Meta(SicprodSerializer.Meta):
         fields = ["id", "url", "name", "start_date_written", "end_date_written", "status", "first_name", "gender", "alternative_label"]
 
     def get_alternative_label(self, obj) -> list[str]:
@@ -249,7 +284,7 @@ class PersonSerializer(SicprodSerializer):
 class PlaceSerializer(SicprodSerializer):
     alternative_label = serializers.SerializerMethodField()
 
-    class Meta:
+    class Meta(SicprodSerializer.Meta):
         fields = ["id", "label", "start_date_written", "end_date_written", "type", "longitude", "latitude", "alternative_label"]
 
     def get_alternative_label(self, obj) -> list[str]:
@@ -257,16 +292,53 @@ class PlaceSerializer(SicprodSerializer):
 
 
 class SalarySerializer(SicprodSerializer):
-    class Meta:
+    class Meta(SicprodSerializer.Meta):
         fields = ["id", "name", "start_date_written", "end_date_written", "typ", "repetitionType"]
 
 
+def get_adjacency(nodes) -> dict:
+    """
+    Collect the ids of the objects related to the nodes using one
+    `values_list` query, grouped by (content type id, object id)
+    of the node. Up to NETWORK_EDGE_FILTER_LIMIT nodes the relations
+    are filtered by the node ids, for more nodes all relations are
+    scanned, which is cheaper than a huge `IN` clause.
+    """
+    keys = {(ContentType.objects.get_for_model(node).id, node.id) for node in nodes}
+    # the subject or object of a relation is nulled when it is deleted
+    edges = Relation.objects.filter(subj_object_id__isnull=False, obj_object_id__isnull=False).order_by().values_list("subj_content_type", "subj_object_id", "obj_content_type", "obj_object_id")
+    if len(keys) <= NETWORK_EDGE_FILTER_LIMIT:
+        ids = {id for _, id in keys}
+        edges = edges.filter(Q(subj_object_id__in=ids) | Q(obj_object_id__in=ids))
+    adjacency = defaultdict(set)
+    for subj_ct, subj_id, obj_ct, obj_id in edges.iterator(chunk_size=10000):
+        if (subj_ct, subj_id) in keys:
+            adjacency[(subj_ct, subj_id)].add(obj_id)
+        if (obj_ct, obj_id) in keys:
+            adjacency[(obj_ct, obj_id)].add(subj_id)
+    return adjacency
+
+
+class NetworkListSerializer(serializers.ListSerializer):
+    """
+    Build the adjacency of all nodes before serializing, instead
+    of querying the relations of every node
+    """
+    def to_representation(self, data):
+        nodes = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context["adjacency"] = get_adjacency(nodes)
+        return super().to_representation(nodes)
+
+
 class NetworkSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     name = serializers.SerializerMethodField()
     type = serializers.SerializerMethodField()
     related_to = serializers.SerializerMethodField()
 
+    class Meta:
+        list_serializer_class = NetworkListSerializer
+
     def get_name(self, obj) -> str:
         return str(obj)
 
@@ -275,6 +347,10 @@ class NetworkSerializer(serializers.Serializer):
         return content_type.name
 
     def get_related_to(self, obj) -> list[int]:
-        rel = Relation.objects.filter(Q(obj_object_id=obj.id)|Q(subj_object_id=obj.id)).values_list("subj_object_id", "obj_object_id")
-        rel = {item for sublist in rel for item in sublist if item != obj.id}
-        return sorted(rel)
+        if "adjacency" in self.context:
+            content_type = ContentType.objects.get_for_model(obj)
+            rel = self.context["adjacency"].get((content_type.id, obj.id), set())
+        else:
+            rel = Relation.objects.filter(Q(obj_object_id=obj.id)|Q(subj_object_id=obj.id)).filter(subj_object_id__isnull=False, obj_object_id__isnull=False).values_list("subj_object_id", "obj_object_id")
+            rel = {item for sublist in rel for item in sublist}
+        return sorted(item for item in rel if item != obj.id)
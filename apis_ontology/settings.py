@@ -23,6 +23,7 @@ INSTALLED_APPS = ["apis_ontology"] + INSTALLED_APPS
 INSTALLED_APPS += ["simple_history"]
 INSTALLED_APPS += ["django_grouper"]
 INSTALLED_APPS += ["django_interval"]
+INSTALLED_APPS += ["django.contrib.postgres"]
 PROJECT_METADATA = {
         "matomo_url": "https://matomo.acdh.oeaw.ac.at/",
         "matomo_id": 242
@@ -40,10 +41,14 @@ def apis_view_passes_test(view) -> bool:
         return True
     if view.permission_action_required == "view":
         obj = view.get_object()
-        from apis_core.collections.models import SkosCollectionContentObject
+        # entities carry the membership in the `published` collection as flag
+        from apis_ontology.models import SicprodMixin
+        if isinstance(obj, SicprodMixin):
+            return obj.published
+        from apis_ontology.publication import get_published_ids
         from django.contrib.contenttypes.models import ContentType
         ct = ContentType.objects.get_for_model(obj)
-        return SkosCollectionContentObject.objects.filter(content_type=ct, object_id=obj.id, collection__name="published").exists()
+        return obj.id in get_published_ids(ct)
     return False
 
 
@@ -55,10 +60,14 @@ APIS_VIEW_PASSES_TEST = apis_view_passes_test
 def apis_list_view_object_filter(view, queryset):
     if view.request.user.is_authenticated:
         return queryset
+    from apis_ontology.models import SicprodMixin
+    if issubclass(queryset.model, SicprodMixin):
+        return queryset.filter(published=True)
     from apis_core.collections.models import SkosCollectionContentObject
+    from apis_ontology.publication import get_published_collection_ids
     from django.contrib.contenttypes.models import ContentType
     ct = ContentType.objects.get_for_model(queryset.model)
-    sccos = SkosCollectionContentObject.objects.filter(content_type=ct, collection__name="published").values_list("object_id")
+    sccos = SkosCollectionContentObject.objects.filter(content_type=ct, collection__in=get_published_collection_ids()).values_list("object_id")
     return queryset.filter(pk__in=sccos)
 
 
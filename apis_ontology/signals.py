@@ -1,10 +1,21 @@
 from apis_core.generic.signals import post_merge_with, post_duplicate
 
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import transaction
 from django.dispatch import receiver
 #from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
 from django.contrib.contenttypes.models import ContentType
 
 from apis_bibsonomy.models import Reference
+from apis_core.collections.models import SkosCollection, SkosCollectionContentObject
+from apis_core.relations.models import Relation
+from apis_ontology.caching import bump_generation
+from apis_ontology.facets import invalidate_facet_summaries
+from apis_ontology.publication import PUBLISHED_COLLECTION
+from apis_ontology.models import SicprodMixin, ReferenceScan, RelationNeighbor, AlternativeLabel, Salary, HiddenSalaryRelation
 #from apis_core.apis_metainfo.models import Collection
 
 import logging
@@ -12,23 +23,52 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-@receiver(post_merge_with)
-def merge_references(sender, instance, entities, **kwargs):
+def merge_references(instance, entities):
+    """
+    Move the references of all merged entities to `instance`, using
+    one update per content type
+    """
+    object_ids = defaultdict(list)
     for entity in entities:
         logger.info(f"Moving references from {entity} to {instance}")
-        content_type = ContentType.objects.get_for_model(entity)
-        references = Reference.objects.filter(content_type=content_type, object_id=entity.id).update(object_id=instance.id)
+        object_ids[ContentType.objects.get_for_model(entity)].append(entity.id)
+    for content_type, ids in object_ids.items():
+        Reference.objects.filter(content_type=content_type, object_id__in=ids).update(object_id=instance.id)
+
+
+@receiver(post_save, sender=Reference)
+def resolve_reference_scan(sender, instance, raw, **kwargs):
+    if not raw:
+        # the scan is derived data, failing to resolve it must not
+        # fail the save of the reference
+        try:
+            ReferenceScan.resolve(instance)
+        except Exception as e:
+            logger.warning("Could not resolve scan of %s: %s", instance, e)
 
 
 @receiver(post_duplicate)
 def copy_references(sender, instance, duplicate, **kwargs):
     logger.info(f"Copying references from {instance} to {duplicate}")
     content_type = ContentType.objects.get_for_model(instance)
-    for ref in Reference.objects.filter(content_type=content_type, object_id=instance.id):
+    references = list(Reference.objects.filter(content_type=content_type, object_id=instance.id))
+    originals = [ref.pk for ref in references]
+    scans = {scan.reference_id: scan for scan in ReferenceScan.objects.filter(reference__in=originals)}
+    for ref in references:
         ref.pk = None
         ref._state.adding = True
         ref.object_id = duplicate.id
-        ref.save()
+    with transaction.atomic():
+        copies = Reference.objects.bulk_create(references)
+        # bulk_create sends no signals, so copy the resolved scans and
+        # invalidate the cached lists here
+        ReferenceScan.save_chunk([
+            ReferenceScan(reference=copy, title=scans[original].title, scanfile=scans[original].scanfile, iiif_version=scans[original].iiif_version)
+            for original, copy in zip(originals, copies) if original in scans
+        ])
+    if copies:
+        invalidate_facet_summaries([content_type])
+        bump_generation([content_type])
 
 
 #@receiver(m2m_changed)
@@ -44,14 +84,155 @@ def copy_references(sender, instance, duplicate, **kwargs):
 #            pass
 
 
-@receiver(post_merge_with)
-def create_merge_metadata(sender, instance, entities, **kwargs):
+def create_merge_metadata(instance, entities):
+    """
+    Record the merged entities in the metadata of `instance`
+    """
+    md = instance.metadata or {}
     for entity in entities:
-        md = instance.metadata or {}
-        entstr = f"{entity.name}, {entity.first_name} (ID: {entity.id})"
-        if "Legacy name (merge)" in md:
-            md["Legacy name (merge)"].append(entstr)
+        # only persons have a first name
+        if first_name := getattr(entity, "first_name", None):
+            entstr = f"{entity.name}, {first_name} (ID: {entity.id})"
         else:
-            md["Legacy name (merge)"] = [entstr]
-        instance.metadata = md
-        instance.save()
+            entstr = f"{getattr(entity, 'name', '')} (ID: {entity.id})"
+        md.setdefault("Legacy name (merge)", []).append(entstr)
+    instance.metadata = md
+    instance.save(update_fields=["metadata"])
+
+
+@receiver(post_merge_with)
+def merge_entities(sender, instance, entities, **kwargs):
+    with transaction.atomic():
+        merge_references(instance, entities)
+        create_merge_metadata(instance, entities)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_list_caches(sender, instance, **kwargs):
+    """
+    Drop the facet summaries and invalidate the cached API lists
+    of the content types that are affected by a change
+    """
+    # the relation facets of all lists show the names of the
+    # related entities, so an entity change affects all lists
+    if isinstance(instance, SicprodMixin):
+        invalidate_facet_summaries()
+        bump_generation()
+        return
+    # the API also serves the lists of the relations, the collection
+    # memberships and the references themselves
+    content_types = []
+    if isinstance(instance, Relation):
+        content_types = [instance.subj_content_type_id, instance.obj_content_type_id, ContentType.objects.get_for_model(instance).id]
+    if isinstance(instance, (SkosCollectionContentObject, Reference)):
+        content_types = [instance.content_type_id, ContentType.objects.get_for_model(instance).id]
+    # the ids of the published collections are cached, see `publication`
+    if isinstance(instance, SkosCollection):
+        content_types = [ContentType.objects.get_for_model(SkosCollection).id]
+    if content_types:
+        invalidate_facet_summaries(content_types)
+        bump_generation(content_types)
+
+
+@receiver(post_save)
+def update_relation_neighbors(sender, instance, raw, **kwargs):
+    # the index rows of deleted relations are deleted by the database cascade
+    if isinstance(instance, Relation) and not raw:
+        RelationNeighbor.update_for(instance)
+
+
+@receiver(post_delete)
+def remove_relation_neighbors(sender, instance, **kwargs):
+    if isinstance(instance, SicprodMixin):
+        RelationNeighbor.remove_entity(instance)
+
+
+@receiver(post_merge_with)
+def merge_relation_neighbors(sender, instance, entities, **kwargs):
+    RelationNeighbor.merge(instance, entities)
+
+
+@receiver(post_save)
+def sync_alternative_labels(sender, instance, raw, **kwargs):
+    if isinstance(instance, SicprodMixin) and hasattr(instance, "alternative_label") and not raw:
+        AlternativeLabel.sync(instance)
+
+
+@receiver(post_delete)
+def remove_alternative_labels(sender, instance, **kwargs):
+    if isinstance(instance, SicprodMixin) and hasattr(instance, "alternative_label"):
+        AlternativeLabel.remove(instance)
+
+
+@receiver(post_save, sender=SkosCollectionContentObject)
+@receiver(post_delete, sender=SkosCollectionContentObject)
+def update_published_flag(sender, instance, raw=False, **kwargs):
+    model = instance.content_type.model_class()
+    if model is not None and issubclass(model, SicprodMixin) and not raw:
+        model.update_published([instance.object_id])
+
+
+@receiver(post_save)
+def update_published_flag_of_new_entity(sender, instance, created, raw, **kwargs):
+    if isinstance(instance, SicprodMixin) and created and not raw:
+        type(instance).update_published([instance.pk])
+
+
+@receiver(post_duplicate)
+def update_published_flag_of_duplicate(sender, instance, duplicate, **kwargs):
+    if isinstance(duplicate, SicprodMixin):
+        type(duplicate).update_published([duplicate.pk])
+
+
+@receiver(post_merge_with)
+def update_published_flag_of_merged(sender, instance, entities, **kwargs):
+    if isinstance(instance, SicprodMixin):
+        type(instance).update_published([instance.pk])
+
+
+@receiver(pre_save, sender=SkosCollection)
+def remember_collection_name(sender, instance, raw, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_name = SkosCollection.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+
+
+@receiver(post_save, sender=SkosCollection)
+@receiver(post_delete, sender=SkosCollection)
+def update_published_flags_of_collection(sender, instance, raw=False, **kwargs):
+    """
+    Renaming a collection to or from `published` changes the
+    publication of all its members, so the flags are synced
+    """
+    names = {instance.name, getattr(instance, "_previous_name", None)}
+    if PUBLISHED_COLLECTION in names and not raw:
+        for model in apps.get_app_config("apis_ontology").get_models():
+            if issubclass(model, SicprodMixin):
+                model.update_published()
+        # `update_published` sends no signals
+        invalidate_facet_summaries()
+        bump_generation()
+
+
+@receiver(post_save)
+def update_hidden_salary_relation(sender, instance, raw, **kwargs):
+    # the markers of deleted relations are deleted by the database cascade
+    if isinstance(instance, Relation) and not raw:
+        HiddenSalaryRelation.update_for(instance)
+
+
+@receiver(post_save, sender=Salary)
+def update_hidden_salary(sender, instance, raw, **kwargs):
+    if not raw:
+        HiddenSalaryRelation.update_salary(instance)
+
+
+@receiver(pre_delete, sender=Salary)
+def remove_hidden_salary(sender, instance, **kwargs):
+    HiddenSalaryRelation.remove_salary(instance)
+
+
+@receiver(post_merge_with)
+def merge_hidden_salaries(sender, instance, entities, **kwargs):
+    if isinstance(instance, Salary):
+        HiddenSalaryRelation.merge(instance, entities)
@@ -2,7 +2,7 @@ from apis_acdhch_default_settings.urls import urlpatterns
 from django.urls import path, include
 from rest_framework import routers
 
-from apis_ontology.api_views import ListEntityRelations, SicprodModelViewSet, Network
+from apis_ontology.api_views import ListEntityRelations, SicprodModelViewSet, Network, NetworkExport
 from apis_ontology.views import ReferenceScanFail
 
 urlpatterns += [path("apis/api/<contenttype:contenttype>/<int:pk>/relations", ListEntityRelations.as_view(), name="relationslist")]
@@ -14,6 +14,7 @@ router.register(r"", SicprodModelViewSet, basename="genericmodelapi")
 urlpatterns.insert(0, path("apis/api/<contenttype:contenttype>/", include(router.urls)))
 
 urlpatterns += [path("apis/api/network", Network.as_view(), name="network")]
+urlpatterns += [path("apis/api/network/export", NetworkExport.as_view(), name="networkexport")]
 
 urlpatterns += [path("apis/failingreferences", ReferenceScanFail.as_view(), name="referencescanfail")]
 
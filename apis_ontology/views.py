@@ -1,18 +1,11 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from apis_bibsonomy.models import Reference
-from apis_ontology.serializers import iiif_titles, get_folio, normalize_title
 import django_tables2 as tables
 from django.utils.html import format_html
 
 
-def scanfolderexists(ref):
-    if "title" in ref.bibtexjson:
-        return normalize_title(ref.bibtexjson["title"]) in iiif_titles()
-    return False
-
-
 def scanfolder(ref):
-    normtitle = normalize_title(ref.bibtexjson["title"])
+    normtitle = ref.scan.title
     return f"<a href='https://iiif.acdh-dev.oeaw.ac.at/images/sicprod/{normtitle}/'>{normtitle}/</a>"
 
 
@@ -36,9 +29,9 @@ class ReferenceFailTable(tables.Table):
 class ReferenceScanFail(LoginRequiredMixin, tables.SingleTableView):
     template_name = "failingreferences.html"
     table_class = ReferenceFailTable
+    paginate_by = 100
 
     def get_queryset(self, *args, **kwargs):
-        refs = Reference.objects.all()
-        refs = [ref for ref in refs if scanfolderexists(ref)]
-        refs = [ref for ref in refs if get_folio(ref) is None]
-        return refs
+        # the scans are resolved by `updateiiif` and `resolvereferencescans`
+        refs = Reference.objects.filter(scan__title__gt="", scan__scanfile__isnull=True)
+        return refs.select_related("scan").prefetch_related("referenced_object").order_by("pk")